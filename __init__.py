@@ -25,15 +25,41 @@
 ##
 from __future__ import absolute_import
 
-from . import constants, util
+import sys
+from . import constants
 from .objects import *
 
+# The util, metrics and cache submodules pull in a good deal of the standard
+# library, so where the language allows it they are imported only when
+# first used.
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name in ('cache', 'metrics', 'util'):
+            import importlib
+            return importlib.import_module('.' + name, __name__)
+        raise AttributeError("module %r has no attribute %r" %
+                             (__name__, name))
+else:
+    from . import cache, metrics, util
+
 __all__ = (
+    'cache',
     'constants',
+    'metrics',
     'util',
     'CURLError',
     'CURLVersionError',
     'Curl',
+    'CurlMulti',
+    'CurlShare',
+    'PreparedRequest',
+    'StringList',
+    'WriteView',
+    'WriteBuffer',
+    'ReadBuffer',
+    'CFileSink',
+    'Throttle',
+    'DebugTrace',
 )
 
 # Here there be dragons
@@ -0,0 +1,175 @@
+##
+## Name:     aio.py
+## Purpose:  Run libcurl transfers on an asyncio event loop.
+##
+## Copyright (c) 2009-2010 Michael J. Fromberger, All Rights Reserved.
+##
+## Basic usage examples
+##
+##   import asyncio, curled.aio
+##
+##   async def main():
+##       u = await curled.aio.fetch_url('http://www.google.com/')
+##       print(u.code, len(u.read()))
+##
+##   asyncio.run(main())
+##
+## Each event loop gets a single CurlMulti handle, whose socket and timer
+## callbacks are connected to the loop, so any number of transfers can
+## be in flight at once without a thread per transfer.  This module
+## requires Python 3 and is not imported by the top-level package.
+##
+import asyncio, os
+from . import constants, objects, util
+
+
+class _LoopDriver(object):
+    """[private] Drives a CurlMulti from the readiness notifications of
+    an asyncio event loop.
+    """
+    def __init__(self, loop):
+        self.loop = loop
+        self.multi = objects.CurlMulti()
+        self.multi.setopt(constants.CURLMOPT_SOCKETFUNCTION, self.on_socket)
+        self.multi.setopt(constants.CURLMOPT_TIMERFUNCTION, self.on_timer)
+
+        self.timer = None  # pending call_later handle, if any
+        self.fds = {}  # fd -> CURL_POLL_* mask currently registered
+        self.waiting = {}  # native handle -> (curl, future)
+
+    def on_socket(self, fd, what):
+        """[private] CURLMOPT_SOCKETFUNCTION: update the loop's interest
+        in fd to match what libcurl wants.
+        """
+        old = self.fds.pop(fd, constants.CURL_POLL_NONE)
+        if old & constants.CURL_POLL_IN:
+            self.loop.remove_reader(fd)
+        if old & constants.CURL_POLL_OUT:
+            self.loop.remove_writer(fd)
+
+        if what == constants.CURL_POLL_REMOVE:
+            return
+
+        if what & constants.CURL_POLL_IN:
+            self.loop.add_reader(fd, self.on_ready, fd,
+                                 constants.CURL_CSELECT_IN)
+        if what & constants.CURL_POLL_OUT:
+            self.loop.add_writer(fd, self.on_ready, fd,
+                                 constants.CURL_CSELECT_OUT)
+        self.fds[fd] = what
+
+    def on_timer(self, timeout_ms):
+        """[private] CURLMOPT_TIMERFUNCTION: reschedule the timeout.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        if timeout_ms >= 0:
+            self.timer = self.loop.call_later(
+                timeout_ms / 1000.0, self.on_ready,
+                constants.CURL_SOCKET_TIMEOUT, 0)
+
+    def on_ready(self, fd, events):
+        """[private] Report socket activity or a timeout to libcurl, and
+        resolve the futures of any transfers that have finished.
+        """
+        if fd == constants.CURL_SOCKET_TIMEOUT:
+            self.timer = None
+
+        self.multi.socket_action(fd, events)
+        for curl, res in self.multi.info_read():
+            _, fut = self.waiting.pop(curl._curl)
+            if fut.done():
+                continue
+            elif res == constants.CURLE_OK:
+                fut.set_result(None)
+            else:
+                fut.set_exception(util.transfer_error(curl, res))
+
+    def submit(self, curl):
+        """[private] Start a transfer on curl, and return a future that
+        resolves when it is complete.
+        """
+        fut = self.loop.create_future()
+        self.multi.add(curl)
+        self.waiting[curl._curl] = (curl, fut)
+        return fut
+
+    def discard(self, curl):
+        """[private] Abandon the transfer on curl, if it is running.
+        """
+        if self.waiting.pop(curl._curl, None) is not None:
+            self.multi.remove(curl)
+
+
+# Drivers for each event loop in use, keyed by the loop.
+_drivers = {}
+
+
+def forget_drivers():
+    """[private] Called in the child process after fork(): abandon the
+    drivers, whose multi handles belong to the parent.
+    """
+    _drivers.clear()
+
+
+if hasattr(os, 'register_at_fork'):  # Python 3.7+
+    os.register_at_fork(after_in_child=forget_drivers)
+
+
+def driver_for(loop):
+    """[private] Return the driver for loop, creating it if necessary.
+    Drivers of loops that have since been closed are discarded.
+    """
+    for key in [k for k in _drivers if k.is_closed()]:
+        _drivers.pop(key).multi.close()
+
+    drv = _drivers.get(loop)
+    if drv is None:
+        drv = _drivers[loop] = _LoopDriver(loop)
+    return drv
+
+
+async def perform(curl):
+    """Perform whatever action has been configured for the session
+    handle by previous calls to .setopt(), as Curl.perform() does, but
+    yield to the running event loop until it is complete.
+
+    Raises CURLError if the transfer fails.  If the calling task is
+    cancelled, the transfer is aborted.
+    """
+    drv = driver_for(asyncio.get_running_loop())
+    fut = drv.submit(curl)
+    try:
+        await fut
+    except asyncio.CancelledError:
+        drv.discard(curl)
+        raise
+
+
+async def fetch_url(url, headers={}, curl_obj=None, sink=None, metrics=None):
+    """Download the specified URL and return a file-like object to
+    represent it, as util.fetch_url() does, but without blocking the
+    running event loop.
+    """
+    if curl_obj is None:
+        with util.default_pool.handle() as c:
+            return await fetch_url(url, headers, util.default_options(c),
+                                   sink, metrics)
+
+    c, u = util.prepare_fetch(url, headers, curl_obj, sink)
+    try:
+        await perform(c)
+    except objects.CURLError as e:
+        if metrics is not None:
+            metrics.record(c, e.args[1])
+        raise
+    if metrics is not None:
+        metrics.record(c)
+    return util.finish_fetch(c, u)
+
+
+__all__ = ('perform', 'fetch_url')
+
+# Here there be dragons
@@ -0,0 +1,78 @@
+##
+## Name:     bench_startup.py
+## Purpose:  Measure the start-up cost of short-lived curled programs.
+##
+## Copyright (c) 2009-2010 Michael J. Fromberger, All Rights Reserved.
+##
+## Usage:
+##
+##   python -m curled.bench_startup [-n RUNS] [URL]
+##
+## Each run starts a fresh interpreter, which reports how long it took
+## to import curled, to create the first Curl object (which loads the
+## library), and to complete the first request.  Times are in ms.  The
+## default URL is a file: URL, so no network is involved.
+##
+from __future__ import absolute_import, print_function
+
+import json, os, subprocess, sys, tempfile
+
+CHILD = r'''
+import json, sys, time
+t0 = time.time()
+import curled, curled.util
+t1 = time.time()
+c = curled.Curl()
+t2 = time.time()
+curled.util.fetch_url(sys.argv[1], curl_obj=c).read()
+t3 = time.time()
+print(json.dumps(dict(import_ms=(t1 - t0) * 1e3, load_ms=(t2 - t1) * 1e3,
+                      request_ms=(t3 - t2) * 1e3, total_ms=(t3 - t0) * 1e3)))
+'''
+
+
+def run_once(url):
+    """Run one child interpreter against url, and return its timings as
+    a dictionary.
+    """
+    pkg_parent = os.path.dirname(os.path.dirname(os.path.abspath(
+        sys.modules['curled'].__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        p for p in (pkg_parent, env.get('PYTHONPATH')) if p)
+    out = subprocess.check_output([sys.executable, '-c', CHILD, url], env=env)
+    return json.loads(out.decode('utf8'))
+
+
+def main(argv):
+    runs = 10
+    if len(argv) >= 2 and argv[0] == '-n':
+        runs = int(argv[1])
+        argv = argv[2:]
+
+    tmp = None
+    if argv:
+        url = argv[0]
+    else:
+        fd, tmp = tempfile.mkstemp()
+        os.write(fd, b'x' * 1024)
+        os.close(fd)
+        url = 'file://' + tmp
+
+    try:
+        results = [run_once(url) for _ in range(runs)]
+    finally:
+        if tmp is not None:
+            os.unlink(tmp)
+
+    print('%-12s %9s %9s %9s' % ('phase', 'min', 'median', 'max'))
+    for key in ('import_ms', 'load_ms', 'request_ms', 'total_ms'):
+        vs = sorted(r[key] for r in results)
+        print('%-12s %9.2f %9.2f %9.2f' % (key[:-3], vs[0], vs[len(vs) // 2],
+                                          vs[-1]))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+# Here there be dragons
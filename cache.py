@@ -0,0 +1,485 @@
+##
+## Name:     cache.py
+## Purpose:  HTTP response caching for fetch_url().
+##
+## Copyright (c) 2009-2010 Michael J. Fromberger, All Rights Reserved.
+##
+## Basic usage examples
+##
+##   import curled.cache, curled.util
+##   c = curled.cache.DiskCache('/var/tmp/mycache', max_size=64 << 20)
+##   u = curled.util.fetch_url(url, cache=c)
+##   print(c.hits, c.misses, c.revalidations)
+##
+##   m = curled.cache.MemoryCache(16 << 20, key_headers=['Accept'], backend=c)
+##   u = curled.util.fetch_url(url, cache=m)
+##
+## Responses are kept while Cache-Control max-age says they are fresh,
+## and afterward are revalidated with If-None-Match and If-Modified-Since
+## before they are served again.  Only successful (200) GET responses
+## are stored.
+##
+from __future__ import absolute_import
+
+import collections, hashlib, io, json, os, shutil, threading, time
+from . import constants, util
+
+
+def cache_key(url, headers):
+    """[private] Return a key for the response to a request for url with
+    the given request headers.
+    """
+    h = hashlib.sha1(url.encode('utf8'))
+    for k, v in sorted(headers.items()):
+        h.update(('\n%s: %s' % (k, v)).encode('utf8'))
+    return h.hexdigest()
+
+
+def freshness(headers):
+    """[private] Parse the Cache-Control headers of a response.  Returns
+    a pair (store, max_age), where store is False if the response must
+    not be cached and max_age is how long in seconds it may be served
+    without revalidation, or None if the response does not say.
+    """
+    directives = {}
+    for v in headers.get_all(b'cache-control'):
+        for d in v.decode('latin-1').split(','):
+            name, _, arg = d.strip().partition('=')
+            directives[name.lower()] = arg.strip().strip('"')
+
+    if 'no-store' in directives:
+        return False, 0
+    if 'no-cache' in directives:
+        return True, 0
+    try:
+        return True, max(0, int(directives['max-age']))
+    except (KeyError, ValueError):
+        return True, None
+
+
+class DiskCache(object):
+    """An HTTP response cache kept in a directory, which is created if it
+    does not exist.  Pass it to util.fetch_url() as its cache parameter.
+
+    Each response is stored as two files named by a hash of the URL and
+    request headers: the body, and a JSON description of the status and
+    headers.  A response is served from the cache without contacting
+    the server until its Cache-Control max-age expires; after that, the
+    request is made conditional on the stored ETag and Last-Modified
+    time, and a 304 Not Modified reply is answered from the cache.
+
+    The total size of the files is kept below max_size bytes by removing
+    the least recently used responses.  Entries left by an earlier
+    DiskCache on the same directory are reused.  A DiskCache may be used
+    from several threads at once, but not by several processes.
+
+    Attributes:
+    .hits          -- requests answered without contacting the server.
+    .misses        -- requests whose body had to be transferred.
+    .revalidations -- requests answered from the cache after a 304.
+    .size          -- the total size of the cached files, in bytes.
+    """
+    def __init__(self, directory, max_size=256 << 20):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.size = 0
+        self._entries = collections.OrderedDict()  # key -> size, LRU first
+        self._lock = threading.Lock()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._scan()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key, ext):
+        """[private] Return the path of one of the files for key.
+        """
+        return os.path.join(self.directory, key + ext)
+
+    def _scan(self):
+        """[private] Index the entries already in the directory, oldest
+        access first.
+        """
+        found = []
+        names = set(os.listdir(self.directory))
+        for name in names:
+            key, ext = os.path.splitext(name)
+            if ext == '.tmp' or (ext == '.body' and
+                                 key + '.meta' not in names):
+                # Left by an interrupted write.
+                util.remove_if_present(os.path.join(self.directory, name))
+                continue
+            if ext != '.meta':
+                continue
+            try:
+                st = os.stat(self._path(key, '.meta'))
+                size = st.st_size + os.path.getsize(self._path(key, '.body'))
+            except OSError:
+                continue
+            found.append((st.st_mtime, key, size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.size += size
+
+    def _load(self, key):
+        """[private] Return the metadata and body stored for key, or None.
+        The caller must hold the lock.
+        """
+        if key not in self._entries:
+            return None
+        try:
+            with open(self._path(key, '.meta'), 'rb') as fp:
+                meta = json.loads(fp.read().decode('utf8'))
+            with open(self._path(key, '.body'), 'rb') as fp:
+                body = fp.read()
+        except (OSError, IOError, ValueError):
+            self._remove(key)
+            return None
+
+        self._touch(key)
+        return meta, body
+
+    def _touch(self, key):
+        """[private] Mark key as the most recently used entry.  The
+        caller must hold the lock.
+        """
+        self._entries[key] = self._entries.pop(key)
+        try:
+            os.utime(self._path(key, '.meta'), None)
+        except OSError:
+            pass
+
+    def _account(self, key):
+        """[private] Update the recorded size of key, which has just been
+        written, and mark it most recently used.  The caller must hold
+        the lock.
+        """
+        size = (os.path.getsize(self._path(key, '.meta')) +
+                os.path.getsize(self._path(key, '.body')))
+        self.size += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+
+    def _write_temp(self, path, data):
+        """[private] Write data, bytes or a file, to a temporary file to
+        be renamed to path, and return the temporary file's path.
+        """
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            with open(tmp, 'wb') as fp:
+                if isinstance(data, bytes):
+                    fp.write(data)
+                else:
+                    shutil.copyfileobj(data, fp)
+        except:
+            util.remove_if_present(tmp)
+            raise
+        return tmp
+
+    @staticmethod
+    def _encode_meta(meta):
+        """[private] Return the file contents for the metadata meta.
+        """
+        return json.dumps(meta, sort_keys=True).encode('utf8')
+
+    def _save_meta(self, key, meta):
+        """[private] Replace the metadata for key, atomically.
+        """
+        path = self._path(key, '.meta')
+        os.rename(self._write_temp(path, self._encode_meta(meta)), path)
+
+    def _store(self, key, u, max_age):
+        """[private] Add the response in url_result u to the cache, and
+        evict old entries to make room.  u is rewound afterward.  If the
+        files cannot be written, the response is not cached.
+        """
+        size = u.length()
+        if size > self.max_size:
+            with self._lock:
+                self._remove(key)
+            return
+
+        meta = response_meta(u, max_age or 0)
+        body_path = self._path(key, '.body')
+        meta_path = self._path(key, '.meta')
+        with self._lock:
+            # Both files are written in full before either is renamed into
+            # place, so an entry is never left with only one of them.
+            tmps = []
+            try:
+                u.seek(0)
+                tmps.append(self._write_temp(body_path, u.data))
+                tmps.append(self._write_temp(meta_path,
+                                             self._encode_meta(meta)))
+                os.rename(tmps[0], body_path)
+                os.rename(tmps[1], meta_path)
+            except (OSError, IOError):
+                for tmp in tmps:
+                    util.remove_if_present(tmp)
+                self._remove(key)
+                return
+            finally:
+                u.seek(0)
+            self._account(key)
+
+            while self.size > self.max_size and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        """[private] Drop key and its files.  The caller must hold the lock.
+        """
+        self.size -= self._entries.pop(key, 0)
+        for ext in ('.body', '.meta'):
+            util.remove_if_present(self._path(key, ext))
+
+    def clear(self):
+        """Remove every entry from the cache.  The counters are kept.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def fetch(self, url, headers={}, curl_obj=None, sink=None, metrics=None):
+        """Return a url_result for the specified URL, from the cache if
+        possible.  The arguments are as for util.fetch_url(), which calls
+        this when given a cache.
+        """
+        if curl_obj is None:
+            with util.default_pool.handle() as c:
+                return self.fetch(url, headers, util.default_options(c),
+                                  sink, metrics)
+
+        key = cache_key(url, headers)
+        with self._lock:
+            found = self._load(key)
+            if found is not None and time.time() < found[0]['expires']:
+                self.hits += 1
+                return cached_result(*found)
+
+        hdrs = dict(headers)
+        if found is not None:
+            meta, body = found
+            stale = cached_result(meta, body)
+            stored = stale.headers
+            if stored.etag is not None:
+                hdrs['If-None-Match'] = stored.etag.decode('latin-1')
+            if stored.last_modified is not None:
+                curl_obj.setopt(constants.CURLOPT_TIMECONDITION,
+                                constants.CURL_TIMECOND_IFMODSINCE)
+                curl_obj.setopt(constants.CURLOPT_TIMEVALUE,
+                                int(stored.last_modified))
+
+        try:
+            u = util.fetch_url(url, hdrs, curl_obj, sink, metrics)
+            unmet = curl_obj.getinfo(constants.CURLINFO_CONDITION_UNMET)
+        finally:
+            curl_obj.setopt(constants.CURLOPT_TIMECONDITION,
+                            constants.CURL_TIMECOND_NONE)
+
+        store, max_age = freshness(u.headers)
+        if found is not None and (u.code == 304 or unmet):
+            if max_age is not None:
+                meta['expires'] = time.time() + max_age
+            with self._lock:
+                self.revalidations += 1
+                if max_age is not None and key in self._entries:
+                    self._save_meta(key, meta)
+                    self._account(key)
+            stale.duration = u.duration
+            return stale
+
+        with self._lock:
+            self.misses += 1
+        validated = (u.headers.etag is not None or
+                     u.headers.last_modified is not None)
+        if u.code == 200 and store and (max_age or validated):
+            self._store(key, u, max_age)
+        else:
+            with self._lock:  # e.g., now no-store; drop the stale copy
+                self._remove(key)
+        return u
+
+
+class MemoryCache(object):
+    """An HTTP response cache kept in memory.  Pass it to util.fetch_url()
+    as its cache parameter.
+
+    Responses are keyed on the URL and the request headers named in
+    key_headers (case-insensitively), or all of them if key_headers is
+    None.  A response is kept until its Cache-Control max-age expires,
+    or for default_max_age seconds if it gives none.  Only successful
+    (200) responses are kept, and the total size of their bodies is
+    kept below max_size bytes by discarding the least recently used.
+
+    Each caller gets its own url_result, but all of them read from the
+    single stored copy of the body, which is not copied.
+
+    If a request arrives while a transfer for the same key is already
+    under way, it waits for that transfer and shares its result (or its
+    exception) rather than starting another.
+
+    If backend is given, such as a DiskCache, requests the memory cache
+    cannot answer are passed to it rather than directly to fetch_url().
+
+    Attributes:
+    .hits      -- requests answered from memory.
+    .misses    -- requests passed on to fetch_url() or the backend.
+    .coalesced -- requests that waited for another caller's transfer.
+    .size      -- the total size of the cached bodies, in bytes.
+    """
+    def __init__(self, max_size=64 << 20, key_headers=None,
+                 default_max_age=0, backend=None):
+        self.max_size = max_size
+        self.key_headers = (None if key_headers is None else frozenset(
+            name.lower() for name in key_headers))
+        self.default_max_age = default_max_age
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.size = 0
+        self._entries = collections.OrderedDict()  # key -> (meta, body)
+        self._pending = {}  # key -> pending_fetch
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, url, headers):
+        """Return the cache key for a request for url with the given
+        request headers.
+        """
+        headers = dict((k.lower(), v) for k, v in headers.items())
+        if self.key_headers is not None:
+            headers = dict((k, v) for k, v in headers.items()
+                           if k in self.key_headers)
+        return cache_key(url, headers)
+
+    def _remove(self, key):
+        """[private] Drop key.  The caller must hold the lock.
+        """
+        meta, body = self._entries.pop(key)
+        self.size -= len(body)
+
+    def clear(self):
+        """Remove every entry from the cache.  The counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def fetch(self, url, headers={}, curl_obj=None, sink=None, metrics=None):
+        """Return a url_result for the specified URL, from the cache if
+        possible.  The arguments are as for util.fetch_url(), which calls
+        this when given a cache.
+        """
+        key = self.key(url, headers)
+        with self._lock:
+            found = self._entries.get(key)
+            if found is not None:
+                if time.time() < found[0]['expires']:
+                    self._entries[key] = self._entries.pop(key)
+                    self.hits += 1
+                    return cached_result(*found)
+                self._remove(key)
+
+            waiter = self._pending.get(key)
+            if waiter is not None:
+                self.coalesced += 1
+            else:
+                self._pending[key] = pending_fetch()
+                self.misses += 1
+        if waiter is not None:
+            return cached_result(*waiter.wait())
+
+        fetch = util.fetch_url if self.backend is None else self.backend.fetch
+        try:
+            u = fetch(url, headers, curl_obj, sink, metrics)
+            u.seek(0)
+            body = u.read()
+            u.close()
+        except BaseException as e:
+            with self._lock:
+                self._pending.pop(key).fail(e)
+            raise
+
+        store, max_age = freshness(u.headers)
+        if max_age is None:
+            max_age = self.default_max_age
+        found = (response_meta(u, max_age), body)
+        with self._lock:
+            if (u.code == 200 and store and max_age > 0 and
+                    len(body) <= self.max_size):
+                if key in self._entries:
+                    self._remove(key)
+                self._entries[key] = found
+                self.size += len(body)
+                while self.size > self.max_size:
+                    self._remove(next(iter(self._entries)))
+            self._pending.pop(key).finish(found)
+
+        r = cached_result(*found)
+        r.duration = u.duration
+        return r
+
+
+class pending_fetch(object):
+    """[private] A transfer in progress, for which other callers are
+    waiting.
+    """
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+    def finish(self, value):
+        self.value = value
+        self.event.set()
+
+    def fail(self, error):
+        self.error = error
+        self.event.set()
+
+    def wait(self):
+        """Wait for the transfer, and return its value or raise its error.
+        """
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def response_meta(u, max_age):
+    """[private] Return a dictionary describing the status and headers of
+    url_result u, which may be cached for max_age seconds from now.
+    """
+    return dict(url=u.url, actual_url=u.actual_url, code=u.code,
+                headers=[(k.decode('latin-1'), v.decode('latin-1'))
+                         for k, v in u.headers],
+                expires=time.time() + max_age)
+
+
+def cached_result(meta, body):
+    """[private] Construct a url_result from a cached response.
+    """
+    u = util.url_result(meta['url'])
+    u.actual_url = meta['actual_url']
+    u.code = meta['code']
+    u.duration = 0.0
+    u.headers.start(meta['code'])
+    for k, v in meta['headers']:
+        u.headers.add(k.encode('latin-1'), v.encode('latin-1'))
+    u.data = io.BytesIO(body)  # shares body until written to
+    return u
+
+
+__all__ = ('DiskCache', 'MemoryCache')
+
+# Here there be dragons
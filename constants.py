@@ -16,6 +16,25 @@ CURLCLOSEPOLICY_LEAST_TRAFFIC = 3
 CURLCLOSEPOLICY_SLOWEST = 4
 CURLCLOSEPOLICY_CALLBACK = 5
 
+# --- Event bit masks for curl_multi_socket_action() -------------------
+CURL_CSELECT_IN = 1
+CURL_CSELECT_OUT = 2
+CURL_CSELECT_ERR = 4
+
+# --- Value types reported by curl_easy_option_next() ------------------
+CURLOT_LONG = 0
+CURLOT_VALUES = 1
+CURLOT_OFF_T = 2
+CURLOT_OBJECT = 3
+CURLOT_STRING = 4
+CURLOT_SLIST = 5
+CURLOT_CBPTR = 6
+CURLOT_BLOB = 7
+CURLOT_FUNCTION = 8
+CURLOT_FLAG_ALIAS = 1
+CURL_BLOB_NOCOPY = 0
+CURL_BLOB_COPY = 1
+
 # --- Option codes for CURLOPT_FTPSSLAUTH ------------------------------
 CURLFTPAUTH_DEFAULT = 0
 CURLFTPAUTH_SSL = 1
@@ -59,6 +78,20 @@ CURL_LOCK_DATA_DNS = 3
 CURL_LOCK_DATA_SSL_SESSION = 4
 CURL_LOCK_DATA_CONNECT = 5
 
+# --- Bit masks for CURLMOPT_PIPELINING --------------------------------
+CURLPIPE_NOTHING = 0
+CURLPIPE_HTTP1 = 1
+CURLPIPE_MULTIPLEX = 2
+
+# --- Socket actions for CURLMOPT_SOCKETFUNCTION -----------------------
+CURL_POLL_NONE = 0
+CURL_POLL_IN = 1
+CURL_POLL_OUT = 2
+CURL_POLL_INOUT = 3
+CURL_POLL_REMOVE = 4
+CURL_SOCKET_BAD = -1
+CURL_SOCKET_TIMEOUT = -1
+
 # --- Option codes for CURLOPT_PROXYTYPE -------------------------------
 CURLPROXY_HTTP = 0
 CURLPROXY_HTTP_1_0 = 1
@@ -234,11 +267,25 @@ CURLINFO_PRIMARY_IP = 1048608
 CURLINFO_APPCONNECT_TIME = 3145761
 CURLINFO_CERTINFO = 4194338
 CURLINFO_CONDITION_UNMET = 2097187
+CURLINFO_SIZE_UPLOAD_T = 6291463
+CURLINFO_SIZE_DOWNLOAD_T = 6291464
+CURLINFO_SPEED_DOWNLOAD_T = 6291465
+CURLINFO_SPEED_UPLOAD_T = 6291466
+CURLINFO_CONTENT_LENGTH_DOWNLOAD_T = 6291471
+CURLINFO_CONTENT_LENGTH_UPLOAD_T = 6291472
+CURLINFO_TOTAL_TIME_T = 6291506
+CURLINFO_NAMELOOKUP_TIME_T = 6291507
+CURLINFO_CONNECT_TIME_T = 6291508
+CURLINFO_PRETRANSFER_TIME_T = 6291509
+CURLINFO_STARTTRANSFER_TIME_T = 6291510
+CURLINFO_REDIRECT_TIME_T = 6291511
+CURLINFO_APPCONNECT_TIME_T = 6291512
 
 CURLINFO_STRING = 1048576
 CURLINFO_LONG = 2097152
 CURLINFO_DOUBLE = 3145728
 CURLINFO_SLIST = 4194304
+CURLINFO_OFF_T = 6291456
 CURLINFO_MASK = 1048575
 CURLINFO_TYPEMASK = 15728640
 
@@ -251,6 +298,28 @@ CURLIOE_OK = 0
 CURLIOE_UNKNOWNCMD = 1
 CURLIOE_FAILRESTART = 2
 
+# --- Return codes from curl_multi_* functions -------------------------
+CURLM_CALL_MULTI_PERFORM = -1
+CURLM_OK = 0
+CURLM_BAD_HANDLE = 1
+CURLM_BAD_EASY_HANDLE = 2
+CURLM_OUT_OF_MEMORY = 3
+CURLM_INTERNAL_ERROR = 4
+CURLM_BAD_SOCKET = 5
+CURLM_UNKNOWN_OPTION = 6
+
+# --- Option codes for curl_multi_setopt() -----------------------------
+CURLMOPT_SOCKETFUNCTION = 20001
+CURLMOPT_SOCKETDATA = 10002
+CURLMOPT_PIPELINING = 3
+CURLMOPT_TIMERFUNCTION = 20004
+CURLMOPT_TIMERDATA = 10005
+CURLMOPT_MAXCONNECTS = 6
+
+# --- Message codes from curl_multi_info_read() ------------------------
+CURLMSG_NONE = 0
+CURLMSG_DONE = 1
+
 # --- Option codes for curl_easy_setopt() ------------------------------
 CURLOPT_FILE = 10001
 CURLOPT_URL = 10002
@@ -263,6 +332,7 @@ CURLOPT_INFILE = 10009
 CURLOPT_ERRORBUFFER = 10010
 CURLOPT_WRITEFUNCTION = 20011
 CURL_WRITEFUNC_PAUSE = 268435457
+CURL_PROGRESSFUNC_CONTINUE = 268435457
 CURLOPT_READFUNCTION = 20012
 CURL_READFUNC_ABORT = 268435456
 CURL_READFUNC_PAUSE = 268435457
@@ -306,6 +376,8 @@ CURLOPT_TRANSFERTEXT = 53
 CURLOPT_PUT = 54
 CURLOPT_PROGRESSFUNCTION = 20056
 CURLOPT_PROGRESSDATA = 10057
+CURLOPT_XFERINFOFUNCTION = 20219
+CURLOPT_XFERINFODATA = 10057
 CURLOPT_AUTOREFERER = 58
 CURLOPT_PROXYPORT = 59
 CURLOPT_POSTFIELDSIZE = 60
@@ -429,6 +501,7 @@ CURLOPTTYPE_LONG = 0
 CURLOPTTYPE_OBJECTPOINT = 10000
 CURLOPTTYPE_FUNCTIONPOINT = 20000
 CURLOPTTYPE_OFF_T = 30000
+CURLOPTTYPE_BLOB = 40000
 
 # --- Bit masks for curl_easy_pause() ----------------------------------
 CURLPAUSE_RECV = 1
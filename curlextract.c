@@ -134,6 +134,28 @@ int main(int argc, char *argv[]) {
   X(CURLFORM_END);
   X(CURLFORM_STREAM);
 
+  printf("@CURLMcode\n");
+  X(CURLM_CALL_MULTI_PERFORM);
+  X(CURLM_OK);
+  X(CURLM_BAD_HANDLE);
+  X(CURLM_BAD_EASY_HANDLE);
+  X(CURLM_OUT_OF_MEMORY);
+  X(CURLM_INTERNAL_ERROR);
+  X(CURLM_BAD_SOCKET);
+  X(CURLM_UNKNOWN_OPTION);
+
+  printf("@CURLMoption\n");
+  X(CURLMOPT_SOCKETFUNCTION);
+  X(CURLMOPT_SOCKETDATA);
+  X(CURLMOPT_PIPELINING);
+  X(CURLMOPT_TIMERFUNCTION);
+  X(CURLMOPT_TIMERDATA);
+  X(CURLMOPT_MAXCONNECTS);
+
+  printf("@CURLMSG\n");
+  X(CURLMSG_NONE);
+  X(CURLMSG_DONE);
+
   printf("@CURLoption\n");
   X(CURLOPT_FILE);
   X(CURLOPT_URL);
@@ -146,6 +168,7 @@ int main(int argc, char *argv[]) {
   X(CURLOPT_ERRORBUFFER);
   X(CURLOPT_WRITEFUNCTION);
   X(CURL_WRITEFUNC_PAUSE);
+  X(CURL_PROGRESSFUNC_CONTINUE);
   X(CURLOPT_READFUNCTION);
   X(CURL_READFUNC_ABORT);
   X(CURL_READFUNC_PAUSE);
@@ -189,6 +212,8 @@ int main(int argc, char *argv[]) {
   X(CURLOPT_PUT);
   X(CURLOPT_PROGRESSFUNCTION);
   X(CURLOPT_PROGRESSDATA);
+  X(CURLOPT_XFERINFOFUNCTION);
+  X(CURLOPT_XFERINFODATA);
   X(CURLOPT_AUTOREFERER);
   X(CURLOPT_PROXYPORT);
   X(CURLOPT_POSTFIELDSIZE);
@@ -327,6 +352,25 @@ int main(int argc, char *argv[]) {
   X(CURLCLOSEPOLICY_SLOWEST);
   X(CURLCLOSEPOLICY_CALLBACK);
 
+  printf("@curl_cselect\n");
+  X(CURL_CSELECT_IN);
+  X(CURL_CSELECT_OUT);
+  X(CURL_CSELECT_ERR);
+
+  printf("@curl_easytype\n");
+  X(CURLOT_LONG);
+  X(CURLOT_VALUES);
+  X(CURLOT_OFF_T);
+  X(CURLOT_OBJECT);
+  X(CURLOT_STRING);
+  X(CURLOT_SLIST);
+  X(CURLOT_CBPTR);
+  X(CURLOT_BLOB);
+  X(CURLOT_FUNCTION);
+  X(CURLOT_FLAG_ALIAS);
+  X(CURL_BLOB_NOCOPY);
+  X(CURL_BLOB_COPY);
+
   printf("@curl_ftpauth\n");
   X(CURLFTPAUTH_DEFAULT);
   X(CURLFTPAUTH_SSL);
@@ -370,6 +414,20 @@ int main(int argc, char *argv[]) {
   X(CURL_LOCK_DATA_SSL_SESSION);
   X(CURL_LOCK_DATA_CONNECT);
 
+  printf("@curl_pipe\n");
+  X(CURLPIPE_NOTHING);
+  X(CURLPIPE_HTTP1);
+  X(CURLPIPE_MULTIPLEX);
+
+  printf("@curl_poll\n");
+  X(CURL_POLL_NONE);
+  X(CURL_POLL_IN);
+  X(CURL_POLL_OUT);
+  X(CURL_POLL_INOUT);
+  X(CURL_POLL_REMOVE);
+  X(CURL_SOCKET_BAD);
+  X(CURL_SOCKET_TIMEOUT);
+
   printf("@curl_proxytype\n");
   X(CURLPROXY_HTTP);
   X(CURLPROXY_HTTP_1_0);
@@ -427,12 +485,26 @@ int main(int argc, char *argv[]) {
   X(CURLINFO_APPCONNECT_TIME);
   X(CURLINFO_CERTINFO);
   X(CURLINFO_CONDITION_UNMET);
+  X(CURLINFO_SIZE_UPLOAD_T);
+  X(CURLINFO_SIZE_DOWNLOAD_T);
+  X(CURLINFO_SPEED_DOWNLOAD_T);
+  X(CURLINFO_SPEED_UPLOAD_T);
+  X(CURLINFO_CONTENT_LENGTH_DOWNLOAD_T);
+  X(CURLINFO_CONTENT_LENGTH_UPLOAD_T);
+  X(CURLINFO_TOTAL_TIME_T);
+  X(CURLINFO_NAMELOOKUP_TIME_T);
+  X(CURLINFO_CONNECT_TIME_T);
+  X(CURLINFO_PRETRANSFER_TIME_T);
+  X(CURLINFO_STARTTRANSFER_TIME_T);
+  X(CURLINFO_REDIRECT_TIME_T);
+  X(CURLINFO_APPCONNECT_TIME_T);
 
   printf("@curlinfotype\n");
   X(CURLINFO_STRING);
   X(CURLINFO_LONG);
   X(CURLINFO_DOUBLE);
   X(CURLINFO_SLIST);
+  X(CURLINFO_OFF_T);
   X(CURLINFO_MASK);
   X(CURLINFO_TYPEMASK);
 
@@ -450,6 +522,7 @@ int main(int argc, char *argv[]) {
   X(CURLOPTTYPE_OBJECTPOINT);
   X(CURLOPTTYPE_FUNCTIONPOINT);
   X(CURLOPTTYPE_OFF_T);
+  X(CURLOPTTYPE_BLOB);
 
   printf("@curlpause\n");
   X(CURLPAUSE_RECV);
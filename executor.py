@@ -0,0 +1,92 @@
+##
+## Name:     executor.py
+## Purpose:  Run libcurl transfers on a pool of threads.
+##
+## Copyright (c) 2009-2010 Michael J. Fromberger, All Rights Reserved.
+##
+## Basic usage examples
+##
+##   import curled.executor
+##
+##   with curled.executor.CurlExecutor(32) as ex:
+##       futs = [ex.fetch(url) for url in urls]
+##       for f in concurrent.futures.as_completed(futs):
+##           u = f.result()
+##           print(u.url, u.code, len(u.read()))
+##
+## ctypes releases the interpreter lock while libcurl runs, so transfers
+## on separate threads proceed in parallel.  Each worker thread keeps
+## its own Curl object for its lifetime, so connections made for one
+## task are reused by later tasks on the same thread.  This module
+## requires Python 3 (or the "futures" backport) and is not imported by
+## the top-level package.
+##
+from __future__ import absolute_import
+
+import concurrent.futures, threading
+from . import constants, objects, util
+
+
+class CurlExecutor(concurrent.futures.ThreadPoolExecutor):
+    """A concurrent.futures executor whose worker threads each keep a
+    persistent Curl object.  Besides the usual .submit() and .map(),
+    .fetch() downloads a URL and .submit_curl() runs a function with the
+    worker's Curl object.
+
+    Before each task the worker's Curl object is reset, which clears
+    its options but keeps its connections, and the options fetch_url()
+    uses by default are applied.  If share is a CurlShare, each worker's
+    object is also attached to it, so the workers share its data, such
+    as the DNS cache and TLS sessions.  The share must not share the
+    connection cache, which libcurl does not support across threads.
+    """
+    def __init__(self, max_workers=None, share=None, factory=objects.Curl):
+        super(CurlExecutor, self).__init__(max_workers)
+        self.share = share
+        self.factory = factory
+        self._local = threading.local()
+
+    def curl(self):
+        """[private] Return the calling worker's Curl object, reset and
+        ready for a new task.
+        """
+        c = getattr(self._local, 'curl', None)
+        if c is None:
+            c = self._local.curl = self.factory()
+        else:
+            c.reset()
+
+        util.default_options(c)
+        if self.share is not None:
+            c.setopt(constants.CURLOPT_SHARE, self.share)
+        return c
+
+    def run_curl(self, fn, args, kw):
+        """[private] Call fn with the worker's Curl object.
+        """
+        return fn(self.curl(), *args, **kw)
+
+    def submit_curl(self, fn, *args, **kw):
+        """Schedule fn(curl, *args, **kw) to be run on a worker thread,
+        where curl is that worker's Curl object, and return a Future for
+        its result.  The Curl object must not be used after fn returns.
+        """
+        return self.submit(self.run_curl, fn, args, kw)
+
+    def fetch(self, url, headers={}, sink=None, metrics=None):
+        """Schedule the specified URL to be downloaded on a worker thread,
+        and return a Future for the resulting url_result.  The arguments
+        are as for util.fetch_url().
+        """
+        return self.submit_curl(fetch_with, url, headers, sink, metrics)
+
+
+def fetch_with(curl, url, headers, sink, metrics):
+    """[private] Download the URL with curl, as util.fetch_url() does.
+    """
+    return util.fetch_url(url, headers, curl, sink, metrics)
+
+
+__all__ = ('CurlExecutor', )
+
+# Here there be dragons
@@ -14,9 +14,11 @@ from ctypes import (
     c_size_t,
     c_uint,
     c_double,
+    c_short,
     POINTER,
     CFUNCTYPE,
     Structure,
+    Union,
 )
 
 # Library types used in <curl/curl.h>
@@ -24,8 +26,18 @@ CURL = c_void_p
 CURLM = c_void_p
 CURLINFO = c_int
 CURLcode = c_int
+CURLMcode = c_int
+CURLMSG = c_int
+CURLMoption = c_int
+CURLSH = c_void_p
+CURLSHcode = c_int
+CURLSHoption = c_int
+curl_lock_data = c_int
+curl_lock_access = c_int
+curl_socket_t = c_int
 CURLoption = c_int
 CURLversion = c_int
+curl_easytype = c_int
 curl_infotype = c_int
 curl_value_t = c_int64
 curl_null = 0  # Use "None" for pointer types
@@ -61,6 +73,46 @@ curl_slist._fields_ = [
 ]
 
 
+class CURLMsg_data(Union):
+    _fields_ = [
+        ('whatever', c_void_p),  # message-specific data
+        ('result', CURLcode),  # return code for transfer (CURLMSG_DONE)
+    ]
+
+
+class CURLMsg(Structure):
+    _fields_ = [
+        ('msg', CURLMSG),  # what this message means
+        ('easy_handle', CURL),  # the handle it concerns
+        ('data', CURLMsg_data),
+    ]
+
+
+class curl_easyoption(Structure):
+    _fields_ = [
+        ('name', c_char_p),  # option name, without the CURLOPT_ prefix
+        ('id', CURLoption),
+        ('type', curl_easytype),  # one of the CURLOT_* constants
+        ('flags', c_uint),  # mask of CURLOT_FLAG_*
+    ]
+
+
+class curl_blob(Structure):
+    _fields_ = [
+        ('data', c_void_p),
+        ('len', c_size_t),
+        ('flags', c_uint),  # CURL_BLOB_COPY or CURL_BLOB_NOCOPY
+    ]
+
+
+class curl_waitfd(Structure):
+    _fields_ = [
+        ('fd', c_int),
+        ('events', c_short),
+        ('revents', c_short),  # not supported yet
+    ]
+
+
 def type_setter(restype, *argtypes):
     def f(funcptr):
         funcptr.restype = restype
@@ -88,12 +140,35 @@ func_type_map = dict(
     curl_free=type_setter(None, c_char_p),
     curl_global_cleanup=type_setter(None),
     curl_global_init=type_setter(CURLcode, c_long),
+    curl_multi_add_handle=type_setter(CURLMcode, CURLM, CURL),
+    curl_multi_cleanup=type_setter(CURLMcode, CURLM),
+    curl_multi_init=type_setter(CURLM),
+    curl_multi_perform=type_setter(CURLMcode, CURLM, POINTER(c_int)),
+    curl_multi_poll=type_setter(CURLMcode, CURLM, POINTER(curl_waitfd),
+                                c_uint, c_int, POINTER(c_int)),
+    curl_multi_remove_handle=type_setter(CURLMcode, CURLM, CURL),
+    curl_multi_setopt=type_setter(CURLMcode, CURLM, CURLMoption, curl_value_t),
+    curl_multi_socket_action=type_setter(CURLMcode, CURLM, curl_socket_t,
+                                         c_int, POINTER(c_int)),
+    curl_multi_strerror=type_setter(c_char_p, CURLMcode),
+    curl_multi_timeout=type_setter(CURLMcode, CURLM, POINTER(c_long)),
+    curl_multi_wait=type_setter(CURLMcode, CURLM, POINTER(curl_waitfd),
+                                c_uint, c_int, POINTER(c_int)),
+    curl_share_cleanup=type_setter(CURLSHcode, CURLSH),
+    curl_share_init=type_setter(CURLSH),
+    curl_share_setopt=type_setter(CURLSHcode, CURLSH, CURLSHoption,
+                                  curl_value_t),
+    curl_share_strerror=type_setter(c_char_p, CURLSHcode),
     curl_version=type_setter(c_char_p),
 
-    # Note: These two functions actually return a pointer to a structure,
+    # Note: These functions actually return a pointer to a structure,
     # but ctypes doesn't permit callbacks to have compound return types.
     # The caller must therefore cast the pointer back manually. :P
     curl_version_info=type_setter(c_void_p, CURLversion),
+    curl_easy_option_by_id=type_setter(c_void_p, CURLoption),  # 7.73.0+
+    curl_easy_option_by_name=type_setter(c_void_p, c_char_p),  # 7.73.0+
+    curl_easy_option_next=type_setter(c_void_p, c_void_p),  # 7.73.0+
+    curl_multi_info_read=type_setter(c_void_p, CURLM, POINTER(c_int)),
     curl_slist_append=type_setter(c_void_p, POINTER(curl_slist), c_char_p),
     curl_slist_free_all=type_setter(None, POINTER(curl_slist)),
 )
@@ -117,38 +192,82 @@ curl_seekfunc_t = CFUNCTYPE(c_int, c_void_p, curl_off_t, c_int)
 curl_progfunc_t = CFUNCTYPE(c_int, c_void_p, c_double, c_double, c_double,
                             c_double)
 
+# For CURLOPT_XFERINFOFUNCTION
+# int xf(void *handle, curl_off_t dltotal, curl_off_t dlnow,
+#        curl_off_t ultotal, curl_off_t ulnow)
+curl_xferinfofunc_t = CFUNCTYPE(c_int, c_void_p, curl_off_t, curl_off_t,
+                                curl_off_t, curl_off_t)
+
 # For CURLOPT_HEADERFUNCTION
 curl_headfunc_t = data_callback_t
 
 # For CURLOPT_DEBUGFUNCTION
 # int df(CURL *ch, curl_infotype t, char *data, size_t size, void *userdata)
-curl_debugfunc_t = CFUNCTYPE(c_int, curl_infotype, c_char_p, c_size_t,
+# The data are not NUL-terminated, so they are passed as a void pointer.
+curl_debugfunc_t = CFUNCTYPE(c_int, CURL, curl_infotype, c_void_p, c_size_t,
                              c_void_p)
 
+# For CURLMOPT_SOCKETFUNCTION
+# int sf(CURL *ch, curl_socket_t s, int what, void *userp, void *socketp)
+curl_socketfunc_t = CFUNCTYPE(c_int, CURL, curl_socket_t, c_int, c_void_p,
+                              c_void_p)
+
+# For CURLMOPT_TIMERFUNCTION
+# int tf(CURLM *multi, long timeout_ms, void *userp)
+curl_timerfunc_t = CFUNCTYPE(c_int, CURLM, c_long, c_void_p)
+
+# For CURLSHOPT_LOCKFUNC
+# void lf(CURL *ch, curl_lock_data data, curl_lock_access access, void *userp)
+curl_lockfunc_t = CFUNCTYPE(None, CURL, curl_lock_data, curl_lock_access,
+                            c_void_p)
+
+# For CURLSHOPT_UNLOCKFUNC
+# void uf(CURL *ch, curl_lock_data data, void *userp)
+curl_unlockfunc_t = CFUNCTYPE(None, CURL, curl_lock_data, c_void_p)
+
 __all__ = (
     # Basic library types
     'CURL',
     'CURLM',
     'CURLINFO',
     'CURLcode',
+    'CURLMcode',
+    'CURLMSG',
+    'CURLMoption',
+    'CURLSH',
+    'CURLSHcode',
+    'CURLSHoption',
     'CURLoption',
     'CURLversion',
+    'curl_easytype',
     'curl_infotype',
+    'curl_lock_data',
+    'curl_lock_access',
     'curl_value_t',
     'curl_null',
     'curl_off_t',
+    'curl_socket_t',
 
     # Structures
     'curl_version_info_data',
     'curl_slist',
+    'CURLMsg',
+    'curl_waitfd',
+    'curl_easyoption',
+    'curl_blob',
 
     # Callback type signatures
     'curl_writefunc_t',
     'curl_readfunc_t',
     'curl_seekfunc_t',
     'curl_progfunc_t',
+    'curl_xferinfofunc_t',
     'curl_headfunc_t',
     'curl_debugfunc_t',
+    'curl_socketfunc_t',
+    'curl_timerfunc_t',
+    'curl_lockfunc_t',
+    'curl_unlockfunc_t',
 
     # Function type signatures
     'func_type_map',
@@ -14,11 +14,16 @@ SECTION_COMMENT = {
     'CURLSHcode': 'Return codes for curl_share_stopt()',
     'CURLSHoption': 'Option codes for curl_share_setopt()',
     'CURLformoption': 'Option codes for CURLFORM_ARRAY values',
+    'CURLMcode': 'Return codes from curl_multi_* functions',
+    'CURLMoption': 'Option codes for curl_multi_setopt()',
+    'CURLMSG': 'Message codes from curl_multi_info_read()',
     'CURLoption': 'Option codes for curl_easy_setopt()',
     'CURLversion': 'Version selectors for curl_version_info()',
     'curlversioncodes': 'Bit masks for curl_version_info_data->features',
     'curl_TimeCond': 'Option codes for CURLOPT_TIMECONDITION',
     'curl_closepolicy': 'Option codes for CURLOPT_CLOSEPOLICY',
+    'curl_cselect': 'Event bit masks for curl_multi_socket_action()',
+    'curl_easytype': 'Value types reported by curl_easy_option_next()',
     'curl_ftpauth': 'Option codes for CURLOPT_FTPSSLAUTH',
     'curl_ftpccc': 'Option codes for CURLOPT_FTP_SSL_CCC',
     'curl_ftpcreatedir': 'Option codes for CURLOPT_FTP_CREATE_MISSING_DIRS',
@@ -27,6 +32,8 @@ SECTION_COMMENT = {
     'Specifies the kind of data passed to information_callback',
     'curl_lock_access': 'Specifies lock access type for lock functions',
     'curl_lock_data': 'Different data locks for a single share',
+    'curl_pipe': 'Bit masks for CURLMOPT_PIPELINING',
+    'curl_poll': 'Socket actions for CURLMOPT_SOCKETFUNCTION',
     'curl_proxytype': 'Option codes for CURLOPT_PROXYTYPE',
     'curl_usessl': 'Option codes for CURLOPT_USE_SSL',
     'curlauth': 'Option codes for CURLOPT_HTTPAUTH',
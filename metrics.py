@@ -0,0 +1,244 @@
+##
+## Name:     metrics.py
+## Purpose:  Compact collection of per-transfer statistics.
+##
+## Copyright (c) 2009-2010 Michael J. Fromberger, All Rights Reserved.
+##
+## Basic usage examples
+##
+##   import curled.metrics, curled.util
+##   m = curled.metrics.TransferMetrics()
+##   for url in urls:
+##       curled.util.fetch_url(url, metrics=m)
+##
+##   print(m.summary('total'))
+##   with open('run.csv', 'w') as fp:
+##       m.to_csv(fp)
+##
+## Each field is stored in its own typed array, so a million transfers
+## cost tens of bytes each rather than a dictionary apiece.
+##
+from __future__ import absolute_import
+
+import array, math, struct, threading
+from . import constants, objects
+
+
+class Histogram(object):
+    """A histogram with logarithmically spaced buckets, updated as
+    values arrive, from which approximate percentiles can be read at
+    any time without keeping or sorting the values.  Each bucket spans
+    a factor of ratio, so percentiles are accurate to within that
+    factor.  Values below lo or above hi are counted in the first or
+    last bucket.
+    """
+    def __init__(self, lo=1e-6, hi=1e6, ratio=1.02):
+        self.lo = lo
+        self.hi = hi
+        self.ratio = ratio
+        self._scale = 1.0 / math.log(ratio)
+        n = int(math.ceil(math.log(hi / lo) * self._scale)) + 1
+        self.counts = array.array('L', [0]) * n
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def bucket(self, value):
+        """Return the index of the bucket containing value.
+        """
+        if value <= self.lo:
+            return 0
+        return min(int(math.log(value / self.lo) * self._scale),
+                   len(self.counts) - 1)
+
+    def bound(self, i):
+        """Return the upper bound of bucket i.
+        """
+        return self.lo * self.ratio**(i + 1)
+
+    def add(self, value):
+        """Count one value.
+        """
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """Return an estimate of the p-th percentile (0 <= p <= 100) of
+        the values counted, or None if there are none.
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, int(math.ceil(p / 100.0 * self.count)))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(max(self.bound(i), self.min), self.max)
+        return self.max
+
+    def buckets(self):
+        """Return a list of (upper bound, count) pairs for the nonempty
+        buckets, in increasing order.
+        """
+        return [(self.bound(i), n) for i, n in enumerate(self.counts) if n]
+
+
+class TransferMetrics(object):
+    """Collects information about completed transfers into columns of
+    typed arrays, one per field, with a running histogram for each
+    timing field.
+
+    Columns:
+    result         -- the CURLcode result of the transfer.
+    primary_ip     -- an index into .addresses, or -1 if unknown.
+    response_code .. num_connects -- as for objects.TransferStats.
+    namelookup .. redirect        -- as for objects.TransferTimings.
+
+    Use .record() to add a transfer from its Curl object, for example
+    as each (curl, result) pair is returned by CurlMulti.info_read().
+    It may be called from several threads at once.
+    """
+    stats_fields = objects.TransferStats.__slots__
+    timing_fields = objects.TransferTimings.__slots__
+
+    # Field names and array type codes, in column order.
+    columns = ((('result', 'i'), ('primary_ip', 'i')) + tuple(
+        (name, 'q') for name in stats_fields) + tuple(
+            (name, 'd') for name in timing_fields))
+
+    def __init__(self):
+        self.cols = dict((name, array.array(tc)) for name, tc in self.columns)
+        self.hists = dict((name, Histogram()) for name in self.timing_fields)
+        self.addresses = []  # distinct primary IP addresses seen
+        self._addr_index = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.cols['result'])
+
+    def column(self, name):
+        """Return the array holding the named column.
+        """
+        return self.cols[name]
+
+    def record(self, curl, result=constants.CURLE_OK):
+        """Add the information for the transfer most recently performed
+        by curl, whose CURLcode result was as given.
+        """
+        stats = curl.transfer_stats()
+        times = curl.timings()
+        ip = curl.getinfo(constants.CURLINFO_PRIMARY_IP)
+
+        with self._lock:
+            if ip:
+                idx = self._addr_index.get(ip)
+                if idx is None:
+                    idx = self._addr_index[ip] = len(self.addresses)
+                    self.addresses.append(ip)
+            else:
+                idx = -1
+
+            cols = self.cols
+            cols['result'].append(result)
+            cols['primary_ip'].append(idx)
+            for name in self.stats_fields:
+                cols[name].append(getattr(stats, name))
+            for name in self.timing_fields:
+                v = getattr(times, name)
+                cols[name].append(v)
+                self.hists[name].add(v)
+
+    def percentiles(self, name, ps=(50, 90, 99)):
+        """Return a dictionary mapping each p in ps to the p-th percentile
+        of the named column.  Timing columns are estimated from their
+        running histograms; other columns are computed exactly.
+        """
+        if name in self.hists:
+            h = self.hists[name]
+            return dict((p, h.percentile(p)) for p in ps)
+
+        vs = sorted(self.cols[name])
+        if not vs:
+            return dict((p, None) for p in ps)
+        return dict((p, vs[max(0, int(math.ceil(p / 100.0 * len(vs))) - 1)])
+                    for p in ps)
+
+    def summary(self, name, ps=(50, 90, 99)):
+        """Return a dictionary giving the count, minimum, maximum, mean
+        and percentiles of the named column.
+        """
+        col = self.cols[name]
+        out = dict(count=len(col),
+                   min=min(col) if col else None,
+                   max=max(col) if col else None,
+                   mean=sum(col) / float(len(col)) if col else None)
+        for p, v in self.percentiles(name, ps).items():
+            out['p%s' % p] = v
+        return out
+
+    def to_csv(self, fp):
+        """Write the collected data to the text file fp as CSV, with a
+        header row.  The primary_ip column gives the address itself.
+        """
+        names = [name for name, tc in self.columns]
+        fp.write(','.join(names) + '\n')
+        cols = [self.cols[name] for name in names]
+        ipcol = names.index('primary_ip')
+        for row in zip(*cols):
+            row = list(row)
+            row[ipcol] = self.addresses[row[ipcol]] if row[ipcol] >= 0 else ''
+            fp.write(','.join(str(v) for v in row) + '\n')
+
+    # Binary format: magic, row count, address table, then each column's
+    # raw array data in column order, all little-endian.
+    MAGIC = b'CURLMET1'
+
+    def save(self, fp):
+        """Write the collected data to the binary file fp.
+        """
+        addrs = '\n'.join(self.addresses).encode('utf8')
+        fp.write(self.MAGIC)
+        fp.write(struct.pack('<QQ', len(self), len(addrs)))
+        fp.write(addrs)
+        for name, tc in self.columns:
+            col = self.cols[name]
+            if struct.pack('=H', 1) != struct.pack('<H', 1):
+                col = array.array(tc, col)
+                col.byteswap()
+            fp.write(col.tobytes())
+
+    @classmethod
+    def load(cls, fp):
+        """Read data written by .save() from the binary file fp, and
+        return a new TransferMetrics holding it.  Histograms are rebuilt
+        from the timing columns.
+        """
+        if fp.read(len(cls.MAGIC)) != cls.MAGIC:
+            raise ValueError("not a metrics file")
+
+        m = cls()
+        n, alen = struct.unpack('<QQ', fp.read(16))
+        addrs = fp.read(alen).decode('utf8')
+        m.addresses = addrs.split('\n') if addrs else []
+        m._addr_index = dict((a, i) for i, a in enumerate(m.addresses))
+        for name, tc in cls.columns:
+            col = m.cols[name]
+            col.frombytes(fp.read(n * col.itemsize))
+            if struct.pack('=H', 1) != struct.pack('<H', 1):
+                col.byteswap()
+        for name in cls.timing_fields:
+            for v in m.cols[name]:
+                m.hists[name].add(v)
+        return m
+
+
+__all__ = ('Histogram', 'TransferMetrics')
+
+# Here there be dragons
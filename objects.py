@@ -6,18 +6,30 @@
 ##
 from __future__ import absolute_import
 
-import atexit, ctypes, ctypes.util, os
+import array, atexit, copy, ctypes, os, threading, time, weakref
 from . import constants, options
 from .lctypes import *
 
 # Default location to look for libcurl
 LIBCURL_LIBRARY_PATH = os.getenv('LIBCURL_LIBRARY_PATH', None)
 
+# Names under which libcurl is commonly installed.  These are tried in
+# order before ctypes.util.find_library(), which may need to run
+# ldconfig or a compiler to find the library.
+LIBCURL_NAMES = ('libcurl.so.4', 'libcurl.4.dylib', 'libcurl.dylib',
+                 'libcurl-x64.dll', 'libcurl.dll')
+
 try:
     unicode = unicode  # Works in Python 2, fails in 3.
 except NameError:
     unicode = str
 
+# Serializes loading and initializing the library; see load_library().
+load_lock = threading.Lock()
+
+# Clock used for rate limiting callbacks.
+clock = getattr(time, 'monotonic', time.time)
+
 
 class CURLError(Exception):
     pass
@@ -29,12 +41,370 @@ class CURLVersionError(CURLError):
     pass
 
 
+class Throttle(object):
+    """Wraps a progress function so that it is called at most rate
+    times per second, however often libcurl reports progress.  Calls in
+    between return immediately, without calling the function.
+
+      curl.setopt(constants.CURLOPT_XFERINFOFUNCTION, Throttle(func, 4))
+    """
+    __slots__ = ('func', 'interval')
+
+    def __init__(self, func, rate):
+        if not rate > 0:
+            raise ValueError("rate must be positive", rate)
+        self.func = func
+        self.interval = 1.0 / rate
+
+
+class DebugTrace(object):
+    """A bounded ring buffer of the events libcurl reports to a debug
+    function, for tracing transfers without CURLOPT_VERBOSE output.
+    All storage is allocated up front; once capacity events have been
+    recorded, each new event replaces the oldest.
+
+      trace = DebugTrace(256)
+      curl.setopt(constants.CURLOPT_DEBUGFUNCTION, trace)
+      curl.perform()
+      for when, kind, size, text in trace.events():
+          ...
+
+    Each event records the time (per the clock used for throttling),
+    the kind (one of the CURLINFO_TEXT ... CURLINFO_SSL_DATA_OUT
+    constants), and the size of the data.  The text of informational
+    and header events is kept; data payloads are kept only if data is
+    true, and are otherwise reported as None.
+    """
+    def __init__(self, capacity=1024, data=False):
+        self.capacity = capacity
+        self.data = data
+        self.count = 0  # total number of events recorded
+        self._times = array.array('d', [0.0]) * capacity
+        self._kinds = array.array('b', [0]) * capacity
+        self._sizes = array.array('q', [0]) * capacity
+        self._texts = [None] * capacity
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def record(self, kind, ptr, size):
+        """[private] Record an event reported by libcurl.
+        """
+        i = self.count % self.capacity
+        self._times[i] = clock()
+        self._kinds[i] = kind
+        self._sizes[i] = size
+        if kind <= constants.CURLINFO_HEADER_OUT or self.data:
+            self._texts[i] = ctypes.string_at(ptr, size)
+        else:
+            self._texts[i] = None
+        self.count += 1
+
+    def events(self):
+        """Return a list of the recorded (time, kind, size, text)
+        tuples, oldest first.
+        """
+        n = len(self)
+        start = self.count - n
+        out = []
+        for j in range(start, start + n):
+            i = j % self.capacity
+            out.append((self._times[i], self._kinds[i], self._sizes[i],
+                        self._texts[i]))
+        return out
+
+    def clear(self):
+        """Discard all recorded events.
+        """
+        self.count = 0
+        self._texts[:] = [None] * self.capacity
+
+
+class WriteView(object):
+    """Wraps a function to be used as a write callback, so that it is
+    passed a memoryview over libcurl's own buffer instead of a copy of
+    the data.  The view is only valid for the duration of the call; the
+    function must copy out anything it wants to keep.
+
+      curl.setopt(constants.CURLOPT_WRITEFUNCTION, WriteView(fp.write))
+    """
+    __slots__ = ('func', )
+
+    def __init__(self, func):
+        self.func = func
+
+
+class WriteBuffer(object):
+    """A write target that copies data from libcurl's buffer directly
+    into a preallocated writable buffer, such as a bytearray or mmap,
+    starting at the given offset.  Data are copied exactly once.  The
+    transfer fails with CURLE_WRITE_ERROR if the buffer fills up.
+
+    Attributes:
+    .view   -- a byte memoryview over the target buffer.
+    .offset -- the position at which the next chunk will be written.
+
+    The target buffer remains exported (and so cannot be resized or
+    closed) until .release() is called.
+    """
+    __slots__ = ('view', 'offset', '_base')
+
+    def __init__(self, buf, offset=0):
+        self.view = memoryview(buf).cast('B')
+        self.offset = offset
+        self._base = (ctypes.c_char * len(self.view)).from_buffer(self.view)
+
+    def __len__(self):
+        return self.offset
+
+    def getvalue(self):
+        """Return a memoryview of the data written so far.
+        """
+        return self.view[:self.offset]
+
+    def write_from(self, ptr, size):
+        """[private] Copy size bytes from address ptr into the buffer.
+        Returns the number of bytes copied, which is 0 on overflow.
+        """
+        end = self.offset + size
+        if end > len(self.view):
+            return 0
+
+        ctypes.memmove(ctypes.addressof(self._base) + self.offset, ptr, size)
+        self.offset = end
+        return size
+
+    def release(self):
+        """Release the target buffer.
+        """
+        self._base = None
+        self.view.release()
+
+
+class ReadBuffer(object):
+    """A read source that copies data from an existing buffer, such as
+    bytes, a bytearray or an mmap, directly into libcurl's buffer,
+    starting at the given offset.  Nothing is allocated per chunk.
+
+    Attributes:
+    .view   -- a byte memoryview over the source buffer.
+    .offset -- the position from which the next chunk will be read.
+    """
+    __slots__ = ('view', 'offset')
+
+    def __init__(self, buf, offset=0):
+        self.view = memoryview(buf).cast('B')
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.view) - self.offset
+
+    def readinto(self, b):
+        """Copy up to len(b) bytes into the writable buffer b, returning
+        the number of bytes copied.
+        """
+        n = min(len(b), len(self.view) - self.offset)
+        b[:n] = self.view[self.offset:self.offset + n]
+        self.offset += n
+        return n
+
+    def release(self):
+        """Release the source buffer.
+        """
+        self.view.release()
+
+
+class CFileSink(object):
+    """A write target backed by a C stdio stream.  libcurl writes data
+    to the stream with the C library's fwrite(), entirely in C, without
+    calling back into Python for each chunk.
+
+    Use CFileSink.fdopen(fd) to write to an open file descriptor, or
+    CFileSink.memstream() to accumulate the data in memory with
+    open_memstream().  Call .close() when the transfer is complete; for
+    a memory stream, it returns the data written.
+    """
+    libc = None
+    stdout_addr = None
+
+    @classmethod
+    def load_libc(cls):
+        """[private] Bind the C library functions used by sinks.
+        """
+        ch = ctypes.CDLL(None, use_errno=True)
+        for fname, restype, argtypes in (
+            ('fdopen', ctypes.c_void_p, (ctypes.c_int, ctypes.c_char_p)),
+            ('open_memstream', ctypes.c_void_p,
+             (ctypes.POINTER(ctypes.c_void_p),
+              ctypes.POINTER(ctypes.c_size_t))),
+            ('fflush', ctypes.c_int, (ctypes.c_void_p, )),
+            ('fclose', ctypes.c_int, (ctypes.c_void_p, )),
+            ('free', None, (ctypes.c_void_p, )),
+        ):
+            fn = getattr(ch, fname, None)
+            if fn is not None:
+                fn.restype = restype
+                fn.argtypes = argtypes
+
+        cls.libc = ch
+        cls.fwrite_addr = ctypes.cast(ch.fwrite, ctypes.c_void_p).value
+
+        # libcurl's default CURLOPT_FILE, restored when a sink is detached.
+        for name in ('stdout', '__stdoutp'):
+            try:
+                cls.stdout_addr = ctypes.c_void_p.in_dll(ch, name).value
+                break
+            except ValueError:
+                pass
+
+    @classmethod
+    def default_data(cls, code):
+        """[private] Return libcurl's default value for the stream option
+        code, CURLOPT_FILE or CURLOPT_WRITEHEADER.
+        """
+        if code == constants.CURLOPT_FILE and cls.stdout_addr is not None:
+            return cls.stdout_addr
+        return curl_null
+
+    def __init__(self, fp, buf=None, size=None):
+        """[private] Use CFileSink.fdopen() or CFileSink.memstream().
+        """
+        if fp is None:
+            raise CURLError("unable to open stream", ctypes.get_errno())
+
+        self.fp = fp
+        self._buf = buf  # for memory streams, the stream's buffer
+        self._size = size  # and its current size
+
+    def __del__(self):
+        self.close()
+
+    @classmethod
+    def fdopen(cls, fd):
+        """Return a sink writing to a duplicate of file descriptor fd.
+        """
+        if cls.libc is None:
+            cls.load_libc()
+
+        dfd = os.dup(fd)
+        fp = cls.libc.fdopen(dfd, b'wb')
+        if fp is None:
+            os.close(dfd)
+        return cls(fp)
+
+    @classmethod
+    def memstream(cls):
+        """Return a sink accumulating data in memory.
+        """
+        if cls.libc is None:
+            cls.load_libc()
+        if not hasattr(cls.libc, 'open_memstream'):
+            raise CURLError("open_memstream is not available")
+
+        buf, size = ctypes.c_void_p(), ctypes.c_size_t()
+        fp = cls.libc.open_memstream(ctypes.byref(buf), ctypes.byref(size))
+        return cls(fp, buf, size)
+
+    def getvalue(self):
+        """Return a copy of the data written so far to a memory stream.
+        """
+        self.libc.fflush(self.fp)
+        return ctypes.string_at(self._buf.value, self._size.value)
+
+    def close(self):
+        """Flush and close the stream.  For a memory stream, returns the
+        data written and frees the buffer; otherwise returns None.
+        """
+        fp = getattr(self, 'fp', None)
+        if fp is None:
+            return None
+
+        self.fp = None
+        self.libc.fclose(fp)
+        if self._buf is None:
+            return None
+
+        data = ctypes.string_at(self._buf.value, self._size.value)
+        self.libc.free(self._buf)
+        self._buf = None
+        return data
+
+
+class InfoRecord(object):
+    """[private] Base class for fixed records of transfer information.
+    """
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for key, v in zip(self.__slots__, values):
+            setattr(self, key, v)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (key, getattr(self, key)) for key in self.__slots__))
+
+    def as_dict(self):
+        """Return the fields of the record as a dictionary.
+        """
+        return dict((key, getattr(self, key)) for key in self.__slots__)
+
+
+class TransferTimings(InfoRecord):
+    """The times at which each phase of a transfer completed, in seconds
+    from the start of the transfer, as returned by Curl.timings().
+    """
+    __slots__ = ('namelookup', 'connect', 'appconnect', 'pretransfer',
+                 'starttransfer', 'total', 'redirect')
+
+
+class TransferStats(InfoRecord):
+    """The response code, sizes (bytes) and speeds (bytes per second) of
+    a transfer, as returned by Curl.transfer_stats().
+    """
+    __slots__ = ('response_code', 'size_download', 'size_upload',
+                 'speed_download', 'speed_upload', 'header_size',
+                 'request_size', 'redirect_count', 'num_connects')
+
+
+class LibFunction(object):
+    """[private] Stands in for the libcurl function fname as an attribute
+    of CurlBase until it is first used, when it is looked up in the
+    library, has its types set by settypes, and replaces itself.  If
+    the library lacks the function, AttributeError is raised.
+    """
+    def __init__(self, dll, fname, settypes):
+        self.dll = dll
+        self.fname = fname
+        self.settypes = settypes
+
+    def __get__(self, obj, cls):
+        fn = self.settypes(getattr(self.dll, self.fname))
+        setattr(CurlBase, '_p_' + self.fname, fn)
+        return fn
+
+
 class CurlBase(object):
     """High-level interface to libcurl.
     """
     libcurl_path = None
     libcurl_dll = None
 
+    # Whether to share string lists among handles; see StringList.intern().
+    intern_strlists = False
+
+    # Incremented in each child process after fork(); handles created in
+    # an earlier generation were inherited from the parent.
+    fork_generation = 0
+
+    # Functions bound as soon as the library is loaded; see load_library().
+    finalizer_functions = ('curl_easy_cleanup', 'curl_multi_cleanup',
+                           'curl_multi_remove_handle', 'curl_share_cleanup',
+                           'curl_share_strerror', 'curl_slist_free_all')
+
+    # Whether the option tables include what the library reports; see
+    # .discover_options().
+    options_discovered = False
+
     @classmethod
     def ENC(cls, obj):
         if isinstance(obj, unicode): return obj.encode('utf8')
@@ -46,45 +416,165 @@ class CurlBase(object):
         else: return obj
 
     @classmethod
-    def load_library(cls, path):
-        """Load and populate a libcurl_base object from the library
-        stored in the specified path.  If no path is given, we use
-        ctypes.util.find_library() to try to find one; if that fails,
-        a CURLError is raised.
+    def open_library(cls, path):
+        """[private] Open the libcurl shared library at the specified path,
+        and return a pair (path, dll).  If no path is given, we try each
+        of LIBCURL_NAMES and then ctypes.util.find_library(); if that
+        fails, a CURLError is raised.
         """
-        if path is None:
-            path = ctypes.util.find_library('curl')
+        if path is not None:
+            return path, ctypes.CDLL(path)
+
+        for name in LIBCURL_NAMES:
+            try:
+                return name, ctypes.CDLL(name)
+            except OSError:
+                continue
+
+        from ctypes.util import find_library  # slow to import and to run
+        path = find_library('curl')
         if path is None:
             raise CURLError("libcurl not found")
+        return path, ctypes.CDLL(path)
 
-        cls.libcurl_path = path
-        cls.libcurl_dll = ch = ctypes.CDLL(path)
+    @classmethod
+    def load_library(cls, path):
+        """Load and populate a libcurl_base object from the library
+        stored in the specified path, or found by searching if no path
+        is given; see .open_library().  Does nothing if a library has
+        already been loaded.
 
+        This is safe to call from several threads at once: the library
+        is loaded and initialized exactly once, and .libcurl_dll is set
+        only when that is complete.
+
+        Functions are bound on first use; see LibFunction.
+        """
+        with load_lock:
+            if cls.libcurl_dll is None:
+                cls.__load_library(path)
+
+    @classmethod
+    def __load_library(cls, path):
+        """[private] Load the library; the caller holds load_lock.
+        """
+        path, ch = cls.open_library(path)
         for fname, settypes in func_type_map.items():
-            try:
-                fhandle = getattr(ch, fname)
-            except AttributeError:
-                continue  # skip this function
+            setattr(cls, '_p_' + fname, LibFunction(ch, fname, settypes))
+
+        # Functions used by finalizers are bound now, since it may not be
+        # possible to do so while the interpreter is shutting down.
+        for fname in cls.finalizer_functions:
+            getattr(cls, '_p_' + fname, None)
+
+        cls.compile_tables()
 
-            pname = '_p_' + fname
-            setattr(cls, pname, settypes(fhandle))
+        info = ctypes.cast(cls._p_curl_version_info(constants.CURLVERSION_NOW),
+                           ctypes.POINTER(curl_version_info_data))
+        cls.version_num = int(info.contents.version_num)
 
-        res = ch.curl_global_init(constants.CURL_GLOBAL_ALL)
+        res = cls._p_curl_global_init(constants.CURL_GLOBAL_ALL)
         if res != constants.CURLE_OK:
             raise CURLError("curl_global_init failed: %s" % res)
 
+        cleanup = cls._p_curl_global_cleanup
+
         def cleanup_libcurl():
-            ch.curl_global_cleanup()
+            cleanup()
 
         atexit.register(cleanup_libcurl)
+        cls.libcurl_path = path
+        cls.libcurl_dll = ch
+
+    @classmethod
+    def discover_options(cls):
+        """[private] Extend the option tables with the options the loaded
+        library reports, using curl_easy_option_next() (libcurl 7.73.0
+        and later).  Options that have a generic type (see
+        options.easytype_map) become usable with .setopt(); the entries
+        of options.option_type_map take precedence.  This is done at
+        most once, when an option not in the static table is first used.
+        """
+        if cls.options_discovered:
+            return
+
+        types, ids = {}, {}
+        next_opt = getattr(cls, '_p_curl_easy_option_next', None)
+        if next_opt is None:
+            ids = dict((key, v) for key, v in vars(constants).items()
+                       if key.startswith('CURLOPT_')
+                       and v in options.option_type_map)
+        else:
+            ptr = next_opt(None)
+            while ptr:
+                opt = ctypes.cast(ptr,
+                                  ctypes.POINTER(curl_easyoption)).contents
+                ids['CURLOPT_' + cls.DEC(opt.name)] = opt.id
+                otype = options.easytype_map.get(opt.type)
+                if otype is not None:
+                    types[opt.id] = otype
+                ptr = next_opt(ptr)
+
+        types.update(options.option_type_map)
+        cls.option_types = types
+        cls.option_ids = ids
+        cls.opt_setter = cls.compile_setters(types)
+        cls.options_discovered = True
+
+    @classmethod
+    def known_options(cls):
+        """Return a dictionary mapping the name of each option the loaded
+        library supports, including aliases, to its code.  Names include
+        the CURLOPT_ prefix, as in the constants module.  If the library
+        cannot enumerate its options, only those in the static table are
+        listed.
+        """
+        CurlBase.discover_options()
+        return CurlBase.option_ids
+
+    @classmethod
+    def option_error(cls, code):
+        """[private] Return the CURLError for an option code that has no
+        setter: one the library reports but whose type is not known here
+        is not supported, and any other is unknown.
+        """
+        if code in (cls.option_ids or {}).values():
+            return CURLError("option selector not supported", code)
+        return CURLError("unknown option selector", code)
+
+    @classmethod
+    def compile_setters(cls, types):
+        """[private] Return a table mapping each option code in types to
+        the method that handles its type.
+        """
+        return dict((code, cls.opt_handler[otype])
+                    for code, otype in types.items()
+                    if otype in cls.opt_handler)
+
+    @classmethod
+    def compile_tables(cls):
+        """[private] Build the tables mapping each option and info
+        selector directly to the method that handles it, so that
+        .setopt() and .getinfo() need only a single lookup.  Initially
+        only the static option table is used; see .discover_options().
+        """
+        cls.option_types = dict(options.option_type_map)
+        cls.option_ids = None
+        cls.options_discovered = False
+        cls.opt_setter = cls.compile_setters(cls.option_types)
+        cls.info_getter = dict(
+            (code, cls.info_handler[itype])
+            for code, itype in options.getinfo_type_map.items()
+            if itype in cls.info_handler)
 
     def __init__(self, path=LIBCURL_LIBRARY_PATH):
         if self.libcurl_dll is None:
-            type(self).load_library(path)
+            CurlBase.load_library(path)
 
         self._curl = self._p_curl_easy_init()
         if self._curl is None:
             raise CURLError("curl_easy_init failed")
+        self._gen = CurlBase.fork_generation
 
         # Cache of callback handles currently known to be set, so they
         # are not scooped by the GC.
@@ -94,11 +584,49 @@ class CurlBase(object):
         # are not scooped by the GC.
         self._stmap = {}
 
+        self._noprogress = 1  # CURLOPT_NOPROGRESS, as last set
+        self._verbose = 0  # CURLOPT_VERBOSE, as last set
+        self._owner = None  # the CurlMulti this is attached to, if any
+
+        # Result buffers reused by .timings() and .transfer_stats().
+        self._ibuf = None
+
     def __del__(self):
         ch = getattr(self, "libcurl_dll", None)
         cs = getattr(self, "_curl", None)
-        if None not in (ch, cs):
-            ch.curl_easy_cleanup(cs)
+        if None not in (ch, cs) and self._gen == CurlBase.fork_generation:
+            # When a cycle is collected, this may be finalized before the
+            # multi handle it is attached to; detach it first, since the
+            # multi handle must not be left holding a freed handle.
+            owner = getattr(self, '_owner', None)
+            if owner is not None:
+                owner.discard(self)
+            self._p_curl_easy_cleanup(cs)
+            self._curl = None
+
+    def renew(self):
+        """[private] Replace a native handle inherited from the parent
+        process across fork() with a duplicate made by
+        curl_easy_duphandle(), which has the same options but none of
+        the parent's connections.  The inherited handle is abandoned
+        rather than cleaned up, since cleaning it up could close
+        connections the parent is still using.
+        """
+        dup = self._p_curl_easy_duphandle(self._curl)
+        if dup is None:
+            raise CURLError("curl_easy_duphandle failed")
+
+        self._curl = dup
+        self._gen = CurlBase.fork_generation
+        self._ibuf = None
+
+        # curl_easy_duphandle() does not copy CURLOPT_SHARE.  A share
+        # inherited along with the handle belongs to the parent too.
+        share = self._stmap.pop(constants.CURLOPT_SHARE, None)
+        if share is not None:
+            share._users.discard(self)
+            if share._gen == CurlBase.fork_generation:
+                self.setopt(constants.CURLOPT_SHARE, share)
 
     # --- Private helper functions -------------------------------------
 
@@ -110,19 +638,24 @@ class CurlBase(object):
         does not support the requested operation, otherwise CURLError.
         """
         res = fn(self._curl, *args, **kw)
-        if res != constants.CURLE_OK:
-            if res == constants.CURLE_FAILED_INIT:
-                raise CURLVersionError(fn.__name__, res)
+        if res:  # anything but CURLE_OK
+            raise self.curl_error(fn, res, args)
+        return res
 
-            elif (fn is self._p_curl_easy_getinfo
-                  and res == constants.CURLE_BAD_FUNCTION_ARGUMENT):
-                raise CURLVersionError(fn.__name__, res, args[0])
+    def curl_error(self, fn, res, args):
+        """[private] Construct the exception reporting that a call to fn
+        with the given arguments returned the error code res.
+        """
+        if res == constants.CURLE_FAILED_INIT:
+            return CURLVersionError(fn.__name__, res)
+
+        elif (fn is self._p_curl_easy_getinfo
+              and res == constants.CURLE_BAD_FUNCTION_ARGUMENT):
+            return CURLVersionError(fn.__name__, res, args[0])
 
-            else:
-                desc = self._p_curl_easy_strerror(res)
-                raise CURLError('%s: %s (%s)' % (fn.__name__, desc, res), res)
         else:
-            return res
+            desc = self._p_curl_easy_strerror(res)
+            return CURLError('%s: %s (%s)' % (fn.__name__, desc, res), res)
 
     def __unpack_slist(self, ptr):
         """[private] Unpack a curl_slist into a list of strings.  Does not
@@ -142,6 +675,22 @@ class CurlBase(object):
         v = int(bool(value))
         self.curl_call(self._p_curl_easy_setopt, code, v)
 
+    def __setopt_noprogress(self, code, value):
+        """[private] Set CURLOPT_NOPROGRESS, remembering the value so it
+        can be restored when a progress function is unset.
+        """
+        v = int(bool(value))
+        self.curl_call(self._p_curl_easy_setopt, code, v)
+        self._noprogress = v
+
+    def __setopt_verbose(self, code, value):
+        """[private] Set CURLOPT_VERBOSE, remembering the value so it
+        can be restored when a debug function is unset.
+        """
+        v = int(bool(value))
+        self.curl_call(self._p_curl_easy_setopt, code, v)
+        self._verbose = v
+
     def __setopt_int(self, code, value):
         """[private] Set an option value that is integral.  Raises
         TypeError if a value other than an int or long is passed.
@@ -174,26 +723,44 @@ class CurlBase(object):
         else:
             raise TypeError("incorrect value type", value)
 
+    def __setopt_blob(self, code, value):
+        """[private] Set an option value that is a struct curl_blob.
+        Accepts any bytes-like object, whose contents libcurl copies.
+        Pass None to set the option to NULL.
+        """
+        if value is None:
+            self.curl_call(self._p_curl_easy_setopt, code, curl_null)
+            return
+
+        try:
+            v = memoryview(value).tobytes()
+        except TypeError:
+            raise TypeError("incorrect value type", value)
+
+        w = ctypes.create_string_buffer(v, len(v))
+        blob = curl_blob(ctypes.addressof(w), len(v), constants.CURL_BLOB_COPY)
+        self.curl_call(self._p_curl_easy_setopt, code, ctypes.addressof(blob))
+
     def __setopt_strlist(self, code, values):
         """[private] Set an option value that is a linked list of
         NUL-terminated strings.  Accepts both string and unicode
         arguments, but unicode is encoded as UTF-8.  Raises ValueError
-        if any encoded value contains a NUL byte.
-        """
-        vs = list(self.ENC(s) for s in values)
-        for v in vs:
-            if b'\0' in v:
-                raise ValueError("value contains an imbedded NUL", v)
+        if any encoded value contains a NUL byte.  Also accepts a
+        StringList.
 
-        lst = None
-        for v in vs:
-            lst = ctypes.cast(self._p_curl_slist_append(lst, v),
-                              ctypes.POINTER(curl_slist))
+        The native list is freed once it is no longer set on the
+        handle.  If .intern_strlists is true, identical lists are
+        shared among handles; see StringList.intern().
+        """
+        if isinstance(values, StringList):
+            lst = values
+        elif self.intern_strlists:
+            lst = StringList.intern(values)
+        else:
+            lst = StringList(values)
 
-        v = curl_null if lst is None else ctypes.cast(lst,
-                                                      ctypes.c_void_p).value
-        self.curl_call(self._p_curl_easy_setopt, code, v)
-        self._stmap[code] = vs
+        self.curl_call(self._p_curl_easy_setopt, code, lst.address)
+        self._stmap[code] = lst
 
     def __check_func(self, value, key):
         """[private] Helper for type-checking filehandle/function values.
@@ -210,23 +777,44 @@ class CurlBase(object):
         """[private] Set an option value expecting a function from
         which data can be read by libcurl.  The value can be either a
         filehandle, or a function taking a count and returning a string.
-        """
-        func = self.__check_func(value, 'read')
-        if func is None:
-            self.curl_call(self._p_curl_easy_setopt, code, curl_null)
-            self._cbmap.pop(code, None)
-            return
 
-        def callback(buf, size, count, info_ignored):
-            exp = size * count
-            try:
-                data = func(exp)
-            except:
-                return constants.CURL_READFUNC_ABORT
+        If the value has a readinto() or recv_into() method, such as a
+        binary file, socket or ReadBuffer, data are read directly into
+        libcurl's buffer without allocating a string for each chunk.
+        """
+        fill = getattr(value, 'readinto', None) or getattr(
+            value, 'recv_into', None)
+        if fill is not None:
+
+            def callback(buf, size, count, info_ignored):
+                exp = size * count
+                try:
+                    act = fill(memoryview(
+                        (ctypes.c_char * exp).from_address(buf)).cast('B'))
+                except:
+                    return constants.CURL_READFUNC_ABORT
+
+                if act is None:  # non-blocking source with no data
+                    return constants.CURL_READFUNC_PAUSE
+                return act
 
-            act = min(exp, len(data))
-            ctypes.memmove(buf, data, act)
-            return act
+        else:
+            func = self.__check_func(value, 'read')
+            if func is None:
+                self.curl_call(self._p_curl_easy_setopt, code, curl_null)
+                self._cbmap.pop(code, None)
+                return
+
+            def callback(buf, size, count, info_ignored):
+                exp = size * count
+                try:
+                    data = func(exp)
+                except:
+                    return constants.CURL_READFUNC_ABORT
+
+                act = min(exp, len(data))
+                ctypes.memmove(buf, data, act)
+                return act
 
         v = curl_readfunc_t(callback)
         self.curl_call(self._p_curl_easy_setopt, code,
@@ -236,26 +824,185 @@ class CurlBase(object):
     def __setopt_writefunc(self, code, value):
         """[private] Set an option value expecting a function to which
         data can be written by libcurl.  The value can be either a
-        filehandle, or a function taking a string to write.
+        filehandle, a function taking a string to write, a WriteView
+        wrapping a function taking a memoryview, a WriteBuffer, or a
+        CFileSink.
+
+        A function taking a string may return CURL_WRITEFUNC_PAUSE to
+        pause the transfer without consuming the data; libcurl passes
+        the same data again once the transfer is unpaused.
+
+        Replacing a CFileSink restores the stream option it set to its
+        default, so that libcurl keeps no pointer to the sink's stream
+        once it is closed.
+        """
+        old = self._cbmap.get(code)
+        if isinstance(old, CFileSink) and value is not old:
+            dcode = self.sink_data_option[code]
+            self.curl_call(self._p_curl_easy_setopt, dcode,
+                           CFileSink.default_data(dcode))
+            self._cbmap.pop(dcode, None)
+
+        if isinstance(value, CFileSink):
+            self.curl_call(self._p_curl_easy_setopt, code,
+                           CFileSink.fwrite_addr)
+            dcode = self.sink_data_option[code]
+            self.curl_call(self._p_curl_easy_setopt, dcode, value.fp)
+            self._cbmap[code] = self._cbmap[dcode] = value
+            return
+
+        elif isinstance(value, WriteBuffer):
+
+            def callback(buf, size, count, info_ignored):
+                return value.write_from(buf, size * count)
+
+        elif isinstance(value, WriteView):
+            func = value.func
+
+            def callback(buf, size, count, info_ignored):
+                n = size * count
+                try:
+                    func(memoryview((ctypes.c_char * n).from_address(buf))
+                         .cast('B'))
+                except:
+                    return 0
+
+                return n
+
+        else:
+            func = self.__check_func(value, 'write')
+            if func is None:
+                self.curl_call(self._p_curl_easy_setopt, code, curl_null)
+                self._cbmap.pop(code, None)
+                return
+
+            def callback(buf, size, count, info_ignored):
+                data = ctypes.string_at(buf, size * count)
+                try:
+                    res = func(data)
+                except:
+                    return 0
+
+                if res == constants.CURL_WRITEFUNC_PAUSE:
+                    return res
+                return len(data)
+
+        v = curl_writefunc_t(callback)
+        self.curl_call(self._p_curl_easy_setopt, code,
+                       ctypes.cast(v, ctypes.c_void_p).value)
+        self._cbmap[code] = v
+
+    def __setopt_share(self, code, value):
+        """[private] Set an option value that is a CurlShare object.
+        Pass None to detach the handle from its share.
         """
-        func = self.__check_func(value, 'write')
-        if func is None:
+        if value is not None and not isinstance(value, CurlShare):
+            raise TypeError("incorrect value type", value)
+
+        self.curl_call(self._p_curl_easy_setopt, code,
+                       curl_null if value is None else value._share)
+        old = self._stmap.pop(code, None)
+        if old is not None:
+            old._users.discard(self)
+        if value is not None:
+            self._stmap[code] = value
+            value._users.add(self)
+
+    def __setopt_progfunc(self, code, value):
+        """[private] Set an option value expecting a function to which
+        libcurl reports the progress of a transfer.  The function is
+        called as func(dltotal, dlnow, ultotal, ulnow), and may return
+        a true value to abort the transfer.  The value may also be a
+        Throttle wrapping such a function.  Pass None to unset it.
+
+        Setting a function also clears CURLOPT_NOPROGRESS, without which
+        libcurl does not call it; unsetting the last one restores the
+        value last given for CURLOPT_NOPROGRESS, by default true.
+        """
+        if value is None:
             self.curl_call(self._p_curl_easy_setopt, code, curl_null)
             self._cbmap.pop(code, None)
+            if not any(c in self._cbmap for c in self.progress_options):
+                self.curl_call(self._p_curl_easy_setopt,
+                               constants.CURLOPT_NOPROGRESS, self._noprogress)
             return
 
-        def callback(buf, size, count, info_ignored):
-            data = ctypes.string_at(buf, size * count)
+        elif isinstance(value, Throttle):
+            func, interval = value.func, value.interval
+        elif hasattr(value, '__call__'):
+            func, interval = value, None
+        else:
+            raise TypeError("value must be a function", value)
+
+        due = [0]  # time at which the function may next be called
+
+        def callback(clientp_ignored, dltotal, dlnow, ultotal, ulnow):
+            if interval is not None:
+                now = clock()
+                if now < due[0]:
+                    return 0
+                due[0] = now + interval
             try:
-                res = func(data)
+                return 1 if func(dltotal, dlnow, ultotal, ulnow) else 0
             except:
+                return 1
+
+        if code == constants.CURLOPT_PROGRESSFUNCTION:
+            v = curl_progfunc_t(callback)
+        else:
+            v = curl_xferinfofunc_t(callback)
+        self.curl_call(self._p_curl_easy_setopt, code,
+                       ctypes.cast(v, ctypes.c_void_p).value)
+        self.curl_call(self._p_curl_easy_setopt, constants.CURLOPT_NOPROGRESS,
+                       0)
+        self._cbmap[code] = v
+
+    def __setopt_debugfunc(self, code, value):
+        """[private] Set an option value expecting a function to which
+        libcurl reports debugging events.  The value may be a DebugTrace,
+        or a function called as func(kind, data), where data is a
+        memoryview that is valid only for the duration of the call.
+        Pass None to unset it.
+
+        Setting a function also sets CURLOPT_VERBOSE, without which
+        libcurl does not call it; unsetting it restores the value last
+        given for CURLOPT_VERBOSE, by default false.
+        """
+        if value is None:
+            self.curl_call(self._p_curl_easy_setopt, code, curl_null)
+            self.curl_call(self._p_curl_easy_setopt,
+                           constants.CURLOPT_VERBOSE, self._verbose)
+            self._cbmap.pop(code, None)
+            return
+
+        elif isinstance(value, DebugTrace):
+            record = value.record
+
+            def callback(ch_ignored, kind, ptr, size, userdata_ignored):
+                try:
+                    record(kind, ptr, size)
+                except:
+                    pass
                 return 0
 
-            return len(data)
+        elif hasattr(value, '__call__'):
 
-        v = curl_writefunc_t(callback)
+            def callback(ch_ignored, kind, ptr, size, userdata_ignored):
+                try:
+                    value(kind, memoryview(
+                        (ctypes.c_char * size).from_address(ptr)).cast('B'))
+                except:
+                    pass
+                return 0
+
+        else:
+            raise TypeError("value must be a DebugTrace or a function",
+                            value)
+
+        v = curl_debugfunc_t(callback)
         self.curl_call(self._p_curl_easy_setopt, code,
                        ctypes.cast(v, ctypes.c_void_p).value)
+        self.curl_call(self._p_curl_easy_setopt, constants.CURLOPT_VERBOSE, 1)
         self._cbmap[code] = v
 
     def __getinfo_wrapper(self, code, result):
@@ -274,6 +1021,11 @@ class CurlBase(object):
         """
         return self.__getinfo_wrapper(code, ctypes.c_long()).value
 
+    def __getinfo_off_t(self, code):
+        """[private] Get an info value that returns a curl_off_t.
+        """
+        return self.__getinfo_wrapper(code, curl_off_t()).value
+
     def __getinfo_cstring(self, code):
         """[private] Get an info value that returns a zero-terminated string.
         Returns None if the resulting pointer is NULL.
@@ -293,17 +1045,35 @@ class CurlBase(object):
         self._p_curl_slist_free_all(ptr)
         return out
 
+    # Progress function options, which need CURLOPT_NOPROGRESS cleared.
+    progress_options = (constants.CURLOPT_PROGRESSFUNCTION,
+                        constants.CURLOPT_XFERINFOFUNCTION)
+
+    # Data options paired with write function options, for CFileSink.
+    sink_data_option = {
+        constants.CURLOPT_WRITEFUNCTION: constants.CURLOPT_FILE,
+        constants.CURLOPT_HEADERFUNCTION: constants.CURLOPT_WRITEHEADER,
+    }
+
     opt_handler = dict(
         bool=__setopt_bool,
         int=__setopt_int,
+        off_t=__setopt_int,
         cstring=__setopt_cstring,
+        blob=__setopt_blob,
         strlist=__setopt_strlist,
         readfn=__setopt_readfunc,
         writefn=__setopt_writefunc,
+        share=__setopt_share,
+        noprogress=__setopt_noprogress,
+        verbose=__setopt_verbose,
+        progressfn=__setopt_progfunc,
+        debugfn=__setopt_debugfunc,
     )
     info_handler = dict(
         double=__getinfo_double,
         int=__getinfo_int,
+        off_t=__getinfo_off_t,
         cstring=__getinfo_cstring,
         strlist=__getinfo_strlist,
     )
@@ -359,28 +1129,49 @@ class Curl(CurlBase):
     def setopt(self, code, value):
         """Set an option value on the CURL object.
         """
-        otype = options.option_type_map.get(code)
-        do_setopt = self.opt_handler.get(otype)
+        do_setopt = self.opt_setter.get(code)
+        if do_setopt is None and not self.options_discovered:
+            CurlBase.discover_options()
+            do_setopt = self.opt_setter.get(code)
 
         if do_setopt:
             do_setopt(self, code, value)
-        elif otype is None:
-            raise CURLError("unknown option selector", code)
 
         # Handle custom cases here
 
         else:
-            raise CURLError("option selector not supported", code)
+            raise self.option_error(code)
+
+    def setopts(self, values):
+        """Set several option values on the CURL object.  The values
+        may be a dictionary mapping option codes to values, or a
+        sequence of (code, value) pairs, which are applied in order.
+
+        All the options are attempted even if some fail.  If any fail,
+        a CURLError is raised afterward whose second argument is a list
+        of (code, exception) pairs for the options that failed.
+        """
+        if hasattr(values, 'items'):
+            values = values.items()
+
+        errors = []
+        for code, value in values:
+            try:
+                self.setopt(code, value)
+            except (CURLError, TypeError, ValueError) as e:
+                errors.append((code, e))
+
+        if errors:
+            raise CURLError("setopts failed", errors)
 
     def getinfo(self, code):
         """Get information about the current state of the CURL object.
         """
-        itype = options.getinfo_type_map.get(code)
-        do_getinfo = self.info_handler.get(itype)
+        do_getinfo = self.info_getter.get(code)
 
         if do_getinfo:
             return do_getinfo(self, code)
-        elif itype is None:
+        elif code not in options.getinfo_type_map:
             raise CURLError("unknown info selector", code)
 
         # Handle custom cases here
@@ -391,15 +1182,684 @@ class Curl(CurlBase):
     def perform(self):
         """Perform whatever action has been configured for the session
         handle by previous calls to .setopt().
+
+        If this object was inherited across fork(), its native handle is
+        first replaced, so that the parent's connections are not used.
         """
+        if self._gen != CurlBase.fork_generation:
+            self.renew()
         return self.curl_call(self._p_curl_easy_perform)
 
+    def clone(self):
+        """Return a new Curl object configured with the same options as
+        this one, duplicated with curl_easy_duphandle().  This is much
+        cheaper than setting up a new object option by option.
+
+        The clone shares this object's string buffers and callbacks, so
+        it remains valid after this object is discarded.  Note that this
+        means callbacks, such as write functions, deliver data from both
+        objects to the same place until they are set anew.
+        """
+        dup = self._p_curl_easy_duphandle(self._curl)
+        if dup is None:
+            raise CURLError("curl_easy_duphandle failed")
+
+        other = copy.copy(self)
+        other._curl = dup
+        other._gen = CurlBase.fork_generation
+        other._cbmap = dict(self._cbmap)
+        other._stmap = dict(self._stmap)
+        other._owner = None
+        other._ibuf = None
+
+        # curl_easy_duphandle() does not copy CURLOPT_SHARE.
+        share = other._stmap.pop(constants.CURLOPT_SHARE, None)
+        if share is not None:
+            other.setopt(constants.CURLOPT_SHARE, share)
+        return other
+
+    # Info selectors for .timings(), in TransferTimings field order, as
+    # (microseconds, seconds) pairs.
+    timing_info = (
+        (constants.CURLINFO_NAMELOOKUP_TIME_T,
+         constants.CURLINFO_NAMELOOKUP_TIME),
+        (constants.CURLINFO_CONNECT_TIME_T, constants.CURLINFO_CONNECT_TIME),
+        (constants.CURLINFO_APPCONNECT_TIME_T,
+         constants.CURLINFO_APPCONNECT_TIME),
+        (constants.CURLINFO_PRETRANSFER_TIME_T,
+         constants.CURLINFO_PRETRANSFER_TIME),
+        (constants.CURLINFO_STARTTRANSFER_TIME_T,
+         constants.CURLINFO_STARTTRANSFER_TIME),
+        (constants.CURLINFO_TOTAL_TIME_T, constants.CURLINFO_TOTAL_TIME),
+        (constants.CURLINFO_REDIRECT_TIME_T, constants.CURLINFO_REDIRECT_TIME),
+    )
+
+    # Info selectors for .transfer_stats(), in TransferStats field order,
+    # as (curl_off_t, fallback) pairs; None means the fallback is a long.
+    stats_info = (
+        (None, constants.CURLINFO_RESPONSE_CODE),
+        (constants.CURLINFO_SIZE_DOWNLOAD_T, constants.CURLINFO_SIZE_DOWNLOAD),
+        (constants.CURLINFO_SIZE_UPLOAD_T, constants.CURLINFO_SIZE_UPLOAD),
+        (constants.CURLINFO_SPEED_DOWNLOAD_T,
+         constants.CURLINFO_SPEED_DOWNLOAD),
+        (constants.CURLINFO_SPEED_UPLOAD_T, constants.CURLINFO_SPEED_UPLOAD),
+        (None, constants.CURLINFO_HEADER_SIZE),
+        (None, constants.CURLINFO_REQUEST_SIZE),
+        (None, constants.CURLINFO_REDIRECT_COUNT),
+        (None, constants.CURLINFO_NUM_CONNECTS),
+    )
+
+    def __info_buffers(self):
+        """[private] Return the reusable (double, off_t, long) result
+        buffers for curl_easy_getinfo(), with references to each.
+        """
+        b = self._ibuf
+        if b is None:
+            d, o, l = ctypes.c_double(), curl_off_t(), ctypes.c_long()
+            b = self._ibuf = (d, ctypes.byref(d), o, ctypes.byref(o), l,
+                              ctypes.byref(l))
+        return b
+
+    def timings(self):
+        """Return a TransferTimings giving the time taken by each phase
+        of the most recent transfer, in seconds.  Uses the microsecond
+        CURLINFO_*_TIME_T selectors where libcurl supports them.
+        """
+        get = self._p_curl_easy_getinfo
+        d, dref, o, oref, _, _ = self.__info_buffers()
+        if self.version_num >= 0x073d00:  # 7.61.0
+            idx, buf, ref, scale = 0, o, oref, 1e6
+        else:
+            idx, buf, ref, scale = 1, d, dref, 1.0
+
+        out = []
+        for codes in self.timing_info:
+            res = get(self._curl, codes[idx], ref)
+            if res:
+                raise self.curl_error(get, res, (codes[idx], ))
+            out.append(buf.value / scale)
+
+        return TransferTimings(*out)
+
+    def transfer_stats(self):
+        """Return a TransferStats giving the response code, sizes and
+        speeds of the most recent transfer.
+        """
+        get = self._p_curl_easy_getinfo
+        d, dref, o, oref, l, lref = self.__info_buffers()
+        use_off_t = self.version_num >= 0x073700  # 7.55.0
+
+        out = []
+        for code_t, code in self.stats_info:
+            if code_t is None:
+                buf, ref = l, lref
+            elif use_off_t:
+                buf, ref, code = o, oref, code_t
+            else:
+                buf, ref = d, dref
+
+            res = get(self._curl, code, ref)
+            if res:
+                raise self.curl_error(get, res, (code, ))
+            out.append(int(buf.value))
+
+        return TransferStats(*out)
+
+    def pause(self, bitmask):
+        """Pause or unpause the transfer in either direction, according
+        to bitmask, a combination of the CURLPAUSE_* constants.
+        """
+        return self.curl_call(self._p_curl_easy_pause, bitmask)
+
     def reset(self):
         """Reset all the options of the session handle to their defaults.
         """
         self._p_curl_easy_reset(self._curl)
         self._cbmap.clear()
+        self._noprogress = 1
+        self._verbose = 0
+
+        # curl_easy_reset() leaves the handle attached to its share.
+        share = self._stmap.get(constants.CURLOPT_SHARE)
         self._stmap.clear()
+        if share is not None:
+            self._stmap[constants.CURLOPT_SHARE] = share
+
+
+class StringList(object):
+    """A native curl_slist built once from a sequence of strings, which
+    can be passed to libcurl for options such as CURLOPT_HTTPHEADER.
+    Strings are encoded as for Curl.setopt().  The native list is owned
+    by this object, and freed when it is discarded.
+
+    Attributes:
+    .values  -- a tuple of the encoded strings.
+    .address -- the address of the native list (0 if it is empty).
+    """
+    def __init__(self, values, path=LIBCURL_LIBRARY_PATH):
+        if CurlBase.libcurl_dll is None:
+            CurlBase.load_library(path)
+
+        self.address = curl_null
+        self.values = vs = tuple(CurlBase.ENC(s) for s in values)
+        for v in vs:
+            if not isinstance(v, bytes):
+                raise TypeError("incorrect value type", v)
+            if b'\0' in v:
+                raise ValueError("value contains an imbedded NUL", v)
+
+        lst = None
+        for v in vs:
+            nxt = CurlBase._p_curl_slist_append(lst, v)
+            if nxt is None:
+                if lst is not None:
+                    CurlBase._p_curl_slist_free_all(lst)
+                raise CURLError("curl_slist_append failed")
+            lst = ctypes.cast(nxt, ctypes.POINTER(curl_slist))
+
+        self._ptr = lst
+        if lst is not None:
+            self.address = ctypes.cast(lst, ctypes.c_void_p).value
+
+    def __del__(self):
+        ptr = getattr(self, '_ptr', None)
+        if ptr is not None:
+            self._ptr = None
+            CurlBase._p_curl_slist_free_all(ptr)
+
+    # Interned lists, keyed by their encoded strings.
+    _interned = weakref.WeakValueDictionary()
+    _intern_lock = threading.Lock()
+
+    @classmethod
+    def intern(cls, values):
+        """Return a StringList for the given strings, sharing an existing
+        one with the same strings if there is one.  Interned lists are
+        freed once no handle or other object refers to them.
+        """
+        key = tuple(CurlBase.ENC(s) for s in values)
+        with cls._intern_lock:
+            lst = cls._interned.get(key)
+        if lst is None:
+            lst = cls(key)
+            with cls._intern_lock:
+                lst = cls._interned.setdefault(key, lst)
+        return lst
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+
+class PreparedRequest(object):
+    """A set of option values converted once to their native form, so
+    that they can be applied to many Curl objects with little work.
+    Strings are encoded and string lists built when the object is
+    created, and the native memory is kept for as long as any Curl
+    object it has been applied to still uses it.
+
+      template = PreparedRequest({
+          constants.CURLOPT_USERAGENT: 'curled/1.0',
+          constants.CURLOPT_HTTPHEADER: ['Accept: application/json'],
+      })
+      for url in urls:
+          curl = Curl()
+          template.apply(curl)
+          curl.setopt(constants.CURLOPT_URL, url)
+
+    Values may be given as a dictionary or as a sequence of (code,
+    value) pairs.  Options other than Boolean, integer, string and
+    string list options are kept as given and applied via .setopt().
+    """
+    def __init__(self, values, path=LIBCURL_LIBRARY_PATH):
+        if CurlBase.libcurl_dll is None:
+            CurlBase.load_library(path)
+        if hasattr(values, 'items'):
+            values = values.items()
+
+        self._native = []  # (code, native value, object to keep)
+        self._other = []  # (code, value), for Curl.setopt()
+        for code, value in values:
+            otype = CurlBase.option_types.get(code)
+            if otype is None and not CurlBase.options_discovered:
+                CurlBase.discover_options()
+                otype = CurlBase.option_types.get(code)
+            if otype is None:
+                raise CurlBase.option_error(code)
+
+            elif otype == 'bool':
+                self._native.append((code, int(bool(value)), None))
+
+            elif otype in ('int', 'off_t'):
+                if not isinstance(value, int):
+                    raise TypeError("incorrect value type", value)
+                self._native.append((code, value, None))
+
+            elif otype == 'cstring' and value is not None:
+                v = CurlBase.ENC(value)
+                if not isinstance(v, bytes):
+                    raise TypeError("incorrect value type", value)
+                if b'\0' in v:
+                    raise ValueError("value contains an imbedded NUL", v)
+                w = ctypes.create_string_buffer(v)
+                self._native.append(
+                    (code, ctypes.cast(w, ctypes.c_void_p).value, w))
+
+            elif otype == 'strlist':
+                lst = value if isinstance(value, StringList) \
+                      else StringList(value)
+                self._native.append((code, lst.address, lst))
+
+            else:
+                self._other.append((code, value))
+
+    def apply(self, curl):
+        """Apply the prepared option values to a Curl object.
+        """
+        setopt = curl._p_curl_easy_setopt
+        h = curl._curl
+        for code, v, keep in self._native:
+            res = setopt(h, code, v)
+            if res:
+                raise curl.curl_error(setopt, res, (code, v))
+            if keep is not None:
+                curl._stmap[code] = keep
+
+        for code, value in self._other:
+            curl.setopt(code, value)
+
+
+class CurlMulti(object):
+    """Interface to the libcurl multi interface, which drives many
+    Curl objects concurrently from a single thread.
+
+    Basic usage:
+
+      multi = CurlMulti()
+      for curl in handles:
+          multi.add(curl)
+      while multi.perform():
+          multi.poll()
+          for curl, res in multi.info_read():
+              ...  # curl is done; res is its CURLcode
+
+    A Curl object added to the multi handle is owned by it until it is
+    removed, either explicitly by .remove() or implicitly when its
+    completion is reported by .info_read().
+    """
+    def __init__(self, path=LIBCURL_LIBRARY_PATH):
+        if CurlBase.libcurl_dll is None:
+            CurlBase.load_library(path)
+
+        self._multi = CurlBase._p_curl_multi_init()
+        if self._multi is None:
+            raise CURLError("curl_multi_init failed")
+        self._gen = CurlBase.fork_generation
+
+        # Curl objects currently attached, keyed by their native handle,
+        # so they are not scooped by the GC while a transfer is running.
+        self._handles = {}
+        self._running = ctypes.c_int()
+
+        # Callback handles currently set on the multi handle.
+        self._cbmap = {}
+
+    def __del__(self):
+        # Detach any handles still attached, but never raise from here.
+        for curl in list(getattr(self, '_handles', {}).values()):
+            self.discard(curl)
+        try:
+            self.close()
+        except CURLError:
+            pass
+
+    def __len__(self):
+        return len(self._handles)
+
+    def check_owner(self):
+        """[private] Throws CURLError if the multi handle was inherited
+        from the parent process across fork(), since its transfers and
+        connections belong to the parent.
+        """
+        if self._gen != CurlBase.fork_generation:
+            raise CURLError("multi handle inherited across fork()")
+
+    def multi_call(self, fn, *args):
+        """[private] Call a libcurl multi function and check its return
+        type; throws a CURLError if the return value is not CURLM_OK.
+        """
+        res = fn(self._multi, *args)
+        if res not in (constants.CURLM_OK, constants.CURLM_CALL_MULTI_PERFORM):
+            desc = CurlBase.DEC(CurlBase._p_curl_multi_strerror(res))
+            raise CURLError('%s: %s (%s)' % (fn.__name__, desc, res), res)
+        return res
+
+    def setopt(self, code, value):
+        """Set an option value on the multi handle.
+
+        The socket callback is called as func(fd, what), where what is
+        one of the CURL_POLL_* codes; the timer callback is called as
+        func(timeout_ms), where timeout_ms is -1 to delete the timer.
+        Pass None to either to unset it.
+        """
+        otype = options.multi_option_type_map.get(code)
+        if otype is None:
+            raise CURLError("unknown multi option selector", code)
+
+        elif otype in ('bool', 'int'):
+            if otype == 'bool':
+                value = int(bool(value))
+            elif not isinstance(value, int):
+                raise TypeError("incorrect value type", value)
+
+            self.multi_call(CurlBase._p_curl_multi_setopt, code, value)
+
+        elif value is None:
+            self.multi_call(CurlBase._p_curl_multi_setopt, code, curl_null)
+            self._cbmap.pop(code, None)
+
+        elif otype == 'socketfn':
+
+            def callback(easy_ignored, fd, what, userp_ignored,
+                         socketp_ignored):
+                try:
+                    value(fd, what)
+                except:
+                    return -1
+                return 0
+
+            self.__setopt_callback(code, curl_socketfunc_t(callback))
+
+        elif otype == 'timerfn':
+
+            def callback(multi_ignored, timeout_ms, userp_ignored):
+                try:
+                    value(timeout_ms)
+                except:
+                    return -1
+                return 0
+
+            self.__setopt_callback(code, curl_timerfunc_t(callback))
+
+        else:
+            raise CURLError("multi option selector not supported", code)
+
+    def __setopt_callback(self, code, v):
+        """[private] Install a callback thunk and keep it alive.
+        """
+        self.multi_call(CurlBase._p_curl_multi_setopt, code,
+                        ctypes.cast(v, ctypes.c_void_p).value)
+        self._cbmap[code] = v
+
+    def add(self, curl):
+        """Add a Curl object to the multi handle.  Its transfer begins
+        on the next call to .perform().
+        """
+        self.check_owner()
+        if curl._gen != CurlBase.fork_generation:
+            curl.renew()
+        if curl._curl in self._handles:
+            raise CURLError("handle already added", curl)
+
+        self.multi_call(CurlBase._p_curl_multi_add_handle, curl._curl)
+        self._handles[curl._curl] = curl
+        curl._owner = self
+
+    def remove(self, curl):
+        """Remove a Curl object from the multi handle, aborting its
+        transfer if it is still in progress.
+        """
+        self.multi_call(CurlBase._p_curl_multi_remove_handle, curl._curl)
+        self._handles.pop(curl._curl, None)
+        curl._owner = None
+
+    def discard(self, curl):
+        """[private] Remove a Curl object from the multi handle if it is
+        attached, ignoring errors, as finalizers must.
+        """
+        if self._handles.pop(curl._curl, None) is None:
+            return
+        curl._owner = None
+        if (getattr(self, '_multi', None) is not None
+                and self._gen == CurlBase.fork_generation):
+            try:
+                self.multi_call(CurlBase._p_curl_multi_remove_handle,
+                                curl._curl)
+            except CURLError:
+                pass
+
+    def perform(self):
+        """Perform whatever work is ready on any of the attached
+        transfers, without blocking.  Returns the number of transfers
+        still running.
+        """
+        self.check_owner()
+        self.multi_call(CurlBase._p_curl_multi_perform,
+                        ctypes.byref(self._running))
+        return self._running.value
+
+    def socket_action(self, fd, events=0):
+        """Inform libcurl of activity on socket fd, where events is a
+        mask of CURL_CSELECT_* bits, or that a timeout has expired if fd
+        is CURL_SOCKET_TIMEOUT.  Returns the number of transfers still
+        running.  This is used to drive the multi handle from an
+        external event loop in conjunction with CURLMOPT_SOCKETFUNCTION
+        and CURLMOPT_TIMERFUNCTION.
+        """
+        self.check_owner()
+        self.multi_call(CurlBase._p_curl_multi_socket_action, fd, events,
+                        ctypes.byref(self._running))
+        return self._running.value
+
+    def poll(self, timeout_ms=1000):
+        """Wait until at least one of the attached transfers has work
+        to do, or until timeout_ms milliseconds have elapsed.  Returns
+        the number of file descriptors with activity.
+
+        Uses curl_multi_poll() where available, falling back to
+        curl_multi_wait(); throws CURLVersionError if neither is.
+        """
+        fn = getattr(CurlBase, '_p_curl_multi_poll', None)
+        if fn is None:
+            fn = getattr(CurlBase, '_p_curl_multi_wait', None)
+        if fn is None:
+            raise CURLVersionError("curl_multi_poll")
+
+        nfds = ctypes.c_int()
+        self.multi_call(fn, None, 0, timeout_ms, ctypes.byref(nfds))
+        return nfds.value
+
+    def timeout(self):
+        """Returns the number of milliseconds libcurl would like to
+        wait before .perform() is next called, or -1 if no timeout is set.
+        """
+        ms = ctypes.c_long()
+        self.multi_call(CurlBase._p_curl_multi_timeout, ctypes.byref(ms))
+        return ms.value
+
+    def info_read(self):
+        """Returns a list of (curl, code) pairs for the transfers that
+        have completed since the last call, where code is the CURLcode
+        result of the transfer.  Completed Curl objects are removed from
+        the multi handle, and may be reused or added again.
+        """
+        out = []
+        left = ctypes.c_int()
+        while True:
+            ptr = CurlBase._p_curl_multi_info_read(self._multi,
+                                                   ctypes.byref(left))
+            if ptr is None:
+                break
+
+            msg = ctypes.cast(ptr, ctypes.POINTER(CURLMsg)).contents
+            if msg.msg != constants.CURLMSG_DONE:
+                continue
+
+            curl = self._handles.get(msg.easy_handle)
+            res = msg.data.result  # read before the message is invalidated
+            if curl is not None:
+                self.remove(curl)
+                out.append((curl, res))
+
+        return out
+
+    def close(self):
+        """Detach all Curl objects and release the multi handle.
+        """
+        cm = getattr(self, '_multi', None)
+        if cm is None:
+            return
+        elif self._gen != CurlBase.fork_generation:
+            # Inherited across fork(); abandon it, as for Curl.renew().
+            self._multi = None
+            for curl in self._handles.values():
+                curl._owner = None
+            self._handles.clear()
+            return
+
+        for h, curl in list(self._handles.items()):
+            if curl._curl == h:
+                self.remove(curl)
+            else:  # cleaned up while attached; libcurl has no handle
+                self._handles.pop(h)
+                curl._owner = None
+
+        CurlBase._p_curl_multi_cleanup(cm)
+        self._multi = None
+        self._cbmap.clear()
+
+
+class CurlShare(object):
+    """Interface to the libcurl share interface, which lets several
+    Curl objects share caches, such as resolved host names, TLS session
+    IDs and open connections.  By default it shares the DNS cache and
+    TLS sessions.
+
+    Basic usage:
+
+      share = CurlShare()
+      curl = Curl()
+      curl.setopt(constants.CURLOPT_SHARE, share)
+
+    The share installs lock callbacks guarding each kind of shared data
+    with its own lock, so by default it is safe to use from Curl objects
+    in different threads.  libcurl does not support sharing the
+    connection cache (CURL_LOCK_DATA_CONNECT) between threads, however;
+    share it only among Curl objects used from a single thread.
+    """
+    def __init__(self,
+                 share=(constants.CURL_LOCK_DATA_DNS,
+                        constants.CURL_LOCK_DATA_SSL_SESSION),
+                 path=LIBCURL_LIBRARY_PATH):
+        if CurlBase.libcurl_dll is None:
+            CurlBase.load_library(path)
+
+        self._share = CurlBase._p_curl_share_init()
+        if self._share is None:
+            raise CURLError("curl_share_init failed")
+        self._gen = CurlBase.fork_generation
+        self._users = weakref.WeakSet()  # Curl objects attached to this
+
+        # One lock per curl_lock_data value, so threads working on
+        # different caches do not contend with each other.
+        self._locks = {}
+
+        def lock(ch_ignored, data, access_ignored, userp_ignored):
+            self._lock_for(data).acquire()
+
+        def unlock(ch_ignored, data, userp_ignored):
+            self._lock_for(data).release()
+
+        # Keep the callback thunks alive as long as the share is.
+        self._cbmap = {
+            constants.CURLSHOPT_LOCKFUNC: curl_lockfunc_t(lock),
+            constants.CURLSHOPT_UNLOCKFUNC: curl_unlockfunc_t(unlock),
+        }
+        for code, v in self._cbmap.items():
+            self.share_call(CurlBase._p_curl_share_setopt, code,
+                            ctypes.cast(v, ctypes.c_void_p).value)
+
+        for data in share:
+            self.share(data)
+
+    def __del__(self):
+        # Curl objects keep their share alive, so any still attached here
+        # are being discarded along with it, as at interpreter exit.
+        # Detach them first, since libcurl will not clean up a share in
+        # use, and never raise from here.
+        for curl in list(getattr(self, '_users', ())):
+            if (getattr(curl, '_curl', None) is not None
+                    and curl._gen == CurlBase.fork_generation):
+                try:
+                    curl.setopt(constants.CURLOPT_SHARE, None)
+                except CURLError:
+                    pass
+        try:
+            self.close()
+        except CURLError:
+            pass
+
+    def _lock_for(self, data):
+        """[private] Return the lock guarding the specified data.
+        """
+        lk = self._locks.get(data)
+        if lk is None:
+            lk = self._locks.setdefault(data, threading.Lock())
+        return lk
+
+    def share_call(self, fn, *args):
+        """[private] Call a libcurl share function and check its return
+        type; throws a CURLError if the return value is not CURLSHE_OK.
+        """
+        res = fn(self._share, *args)
+        if res != constants.CURLSHE_OK:
+            desc = CurlBase.DEC(CurlBase._p_curl_share_strerror(res))
+            raise CURLError('%s: %s (%s)' % (fn.__name__, desc, res), res)
+        return res
+
+    def share(self, data):
+        """Share the specified kind of data, one of the
+        CURL_LOCK_DATA_* constants, among handles using this share.
+        """
+        self._lock_for(data)
+        self.share_call(CurlBase._p_curl_share_setopt,
+                        constants.CURLSHOPT_SHARE, data)
+
+    def unshare(self, data):
+        """Stop sharing the specified kind of data.
+        """
+        self.share_call(CurlBase._p_curl_share_setopt,
+                        constants.CURLSHOPT_UNSHARE, data)
+
+    def close(self):
+        """Release the share handle.  Throws CURLError if any Curl
+        object is still using it.
+        """
+        cs = getattr(self, '_share', None)
+        if cs is None:
+            return
+        elif self._gen != CurlBase.fork_generation:
+            self._share = None  # inherited across fork(); abandon it
+            return
+
+        self.share_call(CurlBase._p_curl_share_cleanup)
+        self._share = None
+
+
+def after_fork():
+    """[private] Called in the child process after fork().  Marks all
+    existing handles as inherited, so that they are not used for new
+    transfers or cleaned up, and replaces the lock used for loading the
+    library, in case another thread held it during the fork.
+    """
+    global load_lock
+    load_lock = threading.Lock()
+    CurlBase.fork_generation += 1
+
 
+if hasattr(os, 'register_at_fork'):  # Python 3.7+
+    os.register_at_fork(after_in_child=after_fork)
 
 # Here there be dragons
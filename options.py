@@ -17,6 +17,7 @@ from . import constants as con
 #   'int'     -- an integer value
 #   'cstring' -- a zero-terminated C string.
 #   'strlist' -- a list of zero-terminated C strings.
+#   'off_t'   -- a 64-bit integer value (curl_off_t).
 #
 getinfo_type_map = {
     con.CURLINFO_EFFECTIVE_URL: 'cstring',
@@ -40,8 +41,8 @@ getinfo_type_map = {
     con.CURLINFO_REQUEST_SIZE: 'int',  # bytes
     con.CURLINFO_SSL_VERIFYRESULT: 'int',
     con.CURLINFO_SSL_ENGINES: 'strlist',
-    con.CURLINFO_CONTENT_LENGTH_DOWNLOAD: 'int',
-    con.CURLINFO_CONTENT_LENGTH_UPLOAD: 'int',
+    con.CURLINFO_CONTENT_LENGTH_DOWNLOAD: 'double',  # bytes, -1 if unknown
+    con.CURLINFO_CONTENT_LENGTH_UPLOAD: 'double',  # bytes, -1 if unknown
     con.CURLINFO_CONTENT_TYPE: 'cstring',
     con.CURLINFO_HTTPAUTH_AVAIL: 'int',  # bitmask
     con.CURLINFO_PROXYAUTH_AVAIL: 'int',  # bitmask
@@ -52,6 +53,21 @@ getinfo_type_map = {
     con.CURLINFO_LASTSOCKET: 'int',
     con.CURLINFO_FTP_ENTRY_PATH: 'cstring',  # or None for NULL
     con.CURLINFO_CONDITION_UNMET: 'int',
+
+    # 64-bit variants, libcurl 7.55.0+ (sizes) and 7.61.0+ (times)
+    con.CURLINFO_SIZE_UPLOAD_T: 'off_t',  # bytes
+    con.CURLINFO_SIZE_DOWNLOAD_T: 'off_t',  # bytes
+    con.CURLINFO_SPEED_DOWNLOAD_T: 'off_t',  # bytes/second
+    con.CURLINFO_SPEED_UPLOAD_T: 'off_t',  # bytes/second
+    con.CURLINFO_CONTENT_LENGTH_DOWNLOAD_T: 'off_t',  # bytes, -1 if unknown
+    con.CURLINFO_CONTENT_LENGTH_UPLOAD_T: 'off_t',  # bytes, -1 if unknown
+    con.CURLINFO_TOTAL_TIME_T: 'off_t',  # microseconds
+    con.CURLINFO_NAMELOOKUP_TIME_T: 'off_t',  # microseconds
+    con.CURLINFO_CONNECT_TIME_T: 'off_t',  # microseconds
+    con.CURLINFO_APPCONNECT_TIME_T: 'off_t',  # microseconds
+    con.CURLINFO_PRETRANSFER_TIME_T: 'off_t',  # microseconds
+    con.CURLINFO_STARTTRANSFER_TIME_T: 'off_t',  # microseconds
+    con.CURLINFO_REDIRECT_TIME_T: 'off_t',  # microseconds
 }
 
 # This dictionary maps option codes to indicators of the expected type
@@ -61,22 +77,34 @@ getinfo_type_map = {
 # Codes:
 #   'bool'    -- a Boolean option, converts to integer.
 #   'int'     -- an integer value.
+#   'off_t'   -- a 64-bit integer value (curl_off_t).
 #   'cstring' -- a zero-terminated C string.
 #   'strlist' -- a sequence of zero-terminated C strings.
+#   'blob'    -- a bytes-like object, copied by libcurl; or None.
 #   'readfn'  -- a callback from which libcurl may read data.
 #   'writefn' -- a callback to which libcurl may write data.
+#   'share'   -- a CurlShare object, or None.
+#   'progressfn' -- a callback to which libcurl reports progress.
+#   'debugfn' -- a callback to which libcurl reports debug events.
+#   'noprogress' -- CURLOPT_NOPROGRESS, a Boolean the progress function
+#                   setters must know of.
+#   'verbose' -- CURLOPT_VERBOSE, a Boolean the debug function setter
+#                must know of.
 #
 option_type_map = {
     # Behavior options
-    con.CURLOPT_VERBOSE: 'bool',
+    con.CURLOPT_VERBOSE: 'verbose',
     con.CURLOPT_HEADER: 'bool',
-    con.CURLOPT_NOPROGRESS: 'bool',
+    con.CURLOPT_NOPROGRESS: 'noprogress',
     con.CURLOPT_NOSIGNAL: 'bool',
 
     # Callback options
     con.CURLOPT_WRITEFUNCTION: 'writefn',
     con.CURLOPT_READFUNCTION: 'readfn',
     con.CURLOPT_HEADERFUNCTION: 'writefn',
+    con.CURLOPT_PROGRESSFUNCTION: 'progressfn',  # doubles
+    con.CURLOPT_XFERINFOFUNCTION: 'progressfn',  # curl_off_t, 7.32.0+
+    con.CURLOPT_DEBUGFUNCTION: 'debugfn',
 
     # Error options
     con.CURLOPT_FAILONERROR: 'bool',
@@ -171,7 +199,7 @@ option_type_map = {
     con.CURLOPT_FILETIME: 'bool',
     con.CURLOPT_NOBODY: 'bool',
     con.CURLOPT_INFILESIZE: 'int',
-    con.CURLOPT_INFILESIZE_LARGE: 'int',
+    con.CURLOPT_INFILESIZE_LARGE: 'off_t',
     con.CURLOPT_UPLOAD: 'bool',
     con.CURLOPT_MAXFILESIZE: 'int',
     con.CURLOPT_TIMECONDITION: 'int',  # value in CURL_TIMECOND_*
@@ -189,6 +217,7 @@ option_type_map = {
     con.CURLOPT_CONNECTTIMEOUT_MS: 'int',  # milliseconds
     con.CURLOPT_IPRESOLVE: 'int',  # value in CURL_IPRESOLVE_*
     con.CURLOPT_CONNECT_ONLY: 'bool',
+    con.CURLOPT_SHARE: 'share',
 
     # SSL and Security options
     con.CURLOPT_SSLCERT: 'cstring',
@@ -226,6 +255,36 @@ option_type_map = {
     con.CURLOPT_TELNETOPTIONS: 'strlist',
 }
 
-__all__ = ('option_type_map', )
+# This dictionary maps the value types reported for each option by
+# curl_easy_option_next() to the codes used in option_type_map.  Types
+# not listed here (objects, callbacks and their data pointers) have no
+# generic handling, and are supported only where listed above.
+#
+easytype_map = {
+    con.CURLOT_LONG: 'int',
+    con.CURLOT_VALUES: 'int',
+    con.CURLOT_OFF_T: 'off_t',
+    con.CURLOT_STRING: 'cstring',
+    con.CURLOT_SLIST: 'strlist',
+    con.CURLOT_BLOB: 'blob',
+}
+
+# This dictionary maps multi option codes to indicators of the expected
+# type for the option value, as for option_type_map above.
+#
+# Codes:
+#   'bool'     -- a Boolean option, converts to integer.
+#   'int'      -- an integer value.
+#   'socketfn' -- a callback notified of socket state changes.
+#   'timerfn'  -- a callback notified of timeout changes.
+#
+multi_option_type_map = {
+    con.CURLMOPT_SOCKETFUNCTION: 'socketfn',
+    con.CURLMOPT_TIMERFUNCTION: 'timerfn',
+    con.CURLMOPT_PIPELINING: 'int',  # mask of CURLPIPE_*
+    con.CURLMOPT_MAXCONNECTS: 'int',
+}
+
+__all__ = ('option_type_map', 'easytype_map', 'multi_option_type_map')
 
 # Here there be dragons
@@ -0,0 +1,24 @@
+##
+## Name:     conftest.py
+## Purpose:  Make the source tree importable as the curled package.
+##
+## Copyright (c) 2009-2010 Michael J. Fromberger, All Rights Reserved.
+##
+## setup.py installs the top-level directory as "curled", so when the
+## tests are run from a checkout the package is loaded from there.
+##
+import importlib.util, os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import curled
+except ImportError:
+    spec = importlib.util.spec_from_file_location(
+        'curled', os.path.join(ROOT, '__init__.py'),
+        submodule_search_locations=[ROOT])
+    curled = importlib.util.module_from_spec(spec)
+    sys.modules['curled'] = curled
+    spec.loader.exec_module(curled)
+
+# Here there be dragons
@@ -0,0 +1,250 @@
+##
+## Name:     test_objects.py
+## Purpose:  Regression tests for the libcurl object wrappers.
+##
+## Copyright (c) 2009-2010 Michael J. Fromberger, All Rights Reserved.
+##
+## Cases that could crash the interpreter, or that concern shutdown, run
+## in a child process so that a failure is reported rather than fatal.
+##
+import os, subprocess, sys, tempfile, textwrap, unittest
+
+import curled
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prefix for child programs, loading curled the way conftest.py does.
+CHILD_PRELUDE = '''
+import importlib.util, os, sys
+spec = importlib.util.spec_from_file_location(
+    'curled', os.path.join(%r, '__init__.py'),
+    submodule_search_locations=[%r])
+curled = importlib.util.module_from_spec(spec)
+sys.modules['curled'] = curled
+spec.loader.exec_module(curled)
+''' % (ROOT, ROOT)
+
+
+def run_child(source, *args):
+    """Run source in a fresh interpreter, and return (returncode, stdout,
+    stderr).
+    """
+    proc = subprocess.Popen(
+        [sys.executable, '-c', CHILD_PRELUDE + textwrap.dedent(source)] +
+        list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = proc.communicate()
+    return proc.returncode, out, err
+
+
+class TempFileTestCase(unittest.TestCase):
+    """Provides self.url, a file: URL for a small file.
+    """
+    body = b'hello, world\n'
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.write(fd, self.body)
+        os.close(fd)
+        self.url = 'file://' + self.path
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+
+class SinkReuseTest(TempFileTestCase):
+    def test_reuse_after_sink(self):
+        # After a fetch into a CFileSink, whose stream is then closed,
+        # the same handle must not write to that stream again.
+        for sink in ('memory', 'file'):
+            code, out, err = run_child('''
+                import curled.util
+                c = curled.Curl()
+                u = curled.util.fetch_url(sys.argv[1], curl_obj=c,
+                                          sink=sys.argv[2])
+                assert u.read() == %r
+                c.perform()
+                u = curled.util.fetch_url(sys.argv[1], curl_obj=c)
+                assert u.read() == %r
+            ''' % (self.body, self.body), self.url, sink)
+            self.assertEqual(code, 0, (sink, err))
+            self.assertEqual(out, self.body)
+
+    def test_replace_sink(self):
+        c = curled.Curl()
+        sink = curled.CFileSink.memstream()
+        c.setopt(curled.constants.CURLOPT_URL, self.url)
+        c.setopt(curled.constants.CURLOPT_WRITEFUNCTION, sink)
+        c.perform()
+        chunks = []
+        c.setopt(curled.constants.CURLOPT_WRITEFUNCTION, chunks.append)
+        self.assertEqual(sink.close(), self.body)
+        c.perform()
+        self.assertEqual(b''.join(chunks), self.body)
+
+
+class ShareTest(TempFileTestCase):
+    def test_drop_share_in_use(self):
+        # A share discarded while a handle still uses it, whether after
+        # .reset() or at exit, must be cleaned up without complaint.
+        code, out, err = run_child('''
+            import gc
+            c = curled.Curl()
+            s = curled.CurlShare()
+            c.setopt(curled.constants.CURLOPT_SHARE, s)
+            c.reset()
+            del s
+            gc.collect()
+            c.setopt(curled.constants.CURLOPT_URL, sys.argv[1])
+            c.setopt(curled.constants.CURLOPT_WRITEFUNCTION, len)
+            c.perform()
+
+            share = curled.CurlShare()
+            curl = curled.Curl()
+            curl.setopt(curled.constants.CURLOPT_SHARE, share)
+            curl.setopt(curled.constants.CURLOPT_URL, sys.argv[1])
+            curl.setopt(curled.constants.CURLOPT_WRITEFUNCTION, len)
+            curl.perform()
+
+            # Collected together, the share may be finalized first.
+            for _ in range(10):
+                s = curled.CurlShare()
+                c = curled.Curl()
+                c.setopt(curled.constants.CURLOPT_SHARE, s)
+                cycle = [s, c]
+                cycle.append(cycle)
+                del s, c, cycle
+                gc.collect()
+        ''', self.url)
+        self.assertEqual(code, 0, err)
+        self.assertEqual(err, b'')
+
+    def test_share_survives_reset(self):
+        c = curled.Curl()
+        s = curled.CurlShare()
+        c.setopt(curled.constants.CURLOPT_SHARE, s)
+        c.reset()
+        self.assertRaises(curled.CURLError, s.close)
+        c.setopt(curled.constants.CURLOPT_SHARE, None)
+        s.close()
+
+    def test_clone_keeps_share(self):
+        # curl_easy_duphandle() does not copy the share; clone() must
+        # attach it again.
+        c = curled.Curl()
+        s = curled.CurlShare()
+        c.setopt(curled.constants.CURLOPT_SHARE, s)
+        d = c.clone()
+        c.setopt(curled.constants.CURLOPT_SHARE, None)
+        self.assertRaises(curled.CURLError, s.close)
+        d.setopt(curled.constants.CURLOPT_URL, self.url)
+        d.setopt(curled.constants.CURLOPT_WRITEFUNCTION, len)
+        d.perform()
+        d.setopt(curled.constants.CURLOPT_SHARE, None)
+        s.close()
+
+    @unittest.skipUnless(hasattr(os, 'register_at_fork'), 'needs fork hooks')
+    def test_renew_drops_inherited_share(self):
+        # A handle renewed after fork() must let go of the parent's share.
+        code, out, err = run_child('''
+            import os
+            K = curled.constants
+            c = curled.Curl()
+            s = curled.CurlShare()
+            c.setopt(K.CURLOPT_SHARE, s)
+            pid = os.fork()
+            if pid == 0:
+                c.setopt(K.CURLOPT_URL, sys.argv[1])
+                c.setopt(K.CURLOPT_WRITEFUNCTION, len)
+                c.perform()
+                ok = K.CURLOPT_SHARE not in c._stmap and c not in s._users
+                os._exit(0 if ok else 1)
+            _, status = os.waitpid(pid, 0)
+            assert status == 0, status
+        ''', self.url)
+        self.assertEqual(code, 0, err)
+
+
+class OptionTest(unittest.TestCase):
+    def test_untyped_option(self):
+        # CURLOPT_WRITEDATA is reported by the library, but has no type.
+        code = curled.Curl.known_options().get('CURLOPT_WRITEDATA')
+        if code is None:
+            self.skipTest('library does not enumerate its options')
+        for code, desc in ((code, 'option selector not supported'),
+                           (99999, 'unknown option selector')):
+            with self.assertRaises(curled.CURLError) as cm:
+                curled.Curl().setopt(code, 1)
+            self.assertEqual(cm.exception.args, (desc, code))
+            with self.assertRaises(curled.CURLError) as cm:
+                curled.PreparedRequest({code: 1})
+            self.assertEqual(cm.exception.args, (desc, code))
+
+
+class MultiTest(TempFileTestCase):
+    def test_drop_multi_in_use(self):
+        # A multi handle discarded with handles still attached, alone or
+        # collected together with them, must detach them quietly.
+        code, out, err = run_child('''
+            import gc
+            K = curled.constants
+            for cycle in (False, True):
+                for _ in range(10):
+                    m = curled.CurlMulti()
+                    cs = [curled.Curl() for _ in range(3)]
+                    for c in cs:
+                        c.setopt(K.CURLOPT_URL, sys.argv[1])
+                        c.setopt(K.CURLOPT_WRITEFUNCTION, len)
+                        m.add(c)
+                    m.perform()
+                    if cycle:
+                        m.cycle = (m, cs)
+                    del m  # the handles outlive it, unless in the cycle
+                    del cs, c
+                    gc.collect()
+        ''', self.url)
+        self.assertEqual(code, 0, err)
+        self.assertEqual(err, b'')
+
+
+class ProgressTest(TempFileTestCase):
+    def test_throttle_rate(self):
+        for rate in (0, -1):
+            self.assertRaises(ValueError, curled.Throttle, len, rate)
+
+    def test_unset_keeps_noprogress(self):
+        # libcurl shows its progress meter only if NOPROGRESS is clear.
+        code, out, err = run_child('''
+            K = curled.constants
+            c = curled.Curl()
+            c.setopt(K.CURLOPT_NOPROGRESS, False)
+            c.setopt(K.CURLOPT_XFERINFOFUNCTION, lambda *args: None)
+            c.setopt(K.CURLOPT_XFERINFOFUNCTION, None)
+            c.setopt(K.CURLOPT_URL, sys.argv[1])
+            c.setopt(K.CURLOPT_WRITEFUNCTION, len)
+            c.perform()
+        ''', self.url)
+        self.assertEqual(code, 0, err)
+        self.assertIn(b'% Total', err)
+
+
+class DebugTest(TempFileTestCase):
+    def test_unset_keeps_verbose(self):
+        # libcurl writes its verbose output to stderr if VERBOSE is set.
+        code, out, err = run_child('''
+            K = curled.constants
+            c = curled.Curl()
+            c.setopt(K.CURLOPT_VERBOSE, True)
+            c.setopt(K.CURLOPT_DEBUGFUNCTION, lambda kind, data: None)
+            c.setopt(K.CURLOPT_DEBUGFUNCTION, None)
+            c.setopt(K.CURLOPT_URL, sys.argv[1])
+            c.setopt(K.CURLOPT_WRITEFUNCTION, len)
+            c.perform()
+        ''', self.url)
+        self.assertEqual(code, 0, err)
+        self.assertIn(b'* ', err)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Here there be dragons
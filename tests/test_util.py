@@ -0,0 +1,57 @@
+##
+## Name:     test_util.py
+## Purpose:  Regression tests for the utility functions.
+##
+## Copyright (c) 2009-2010 Michael J. Fromberger, All Rights Reserved.
+##
+import unittest
+
+from test_objects import TempFileTestCase, run_child
+
+
+class StreamTest(TempFileTestCase):
+    body = b'x' * (1 << 20)
+
+    def test_abandoned_stream(self):
+        # Streams dropped mid-transfer, with or without a reference
+        # cycle, must release their handles cleanly.
+        code, out, err = run_child('''
+            import functools, gc, http.server, threading
+            import curled.util
+
+            class Handler(http.server.SimpleHTTPRequestHandler):
+                def log_message(self, *args):
+                    pass
+
+            class Server(http.server.ThreadingHTTPServer):
+                def handle_error(self, *args):
+                    pass  # abandoned transfers reset their connections
+
+            srv = Server(
+                ('127.0.0.1', 0), functools.partial(
+                    Handler, directory=os.path.dirname(sys.argv[1])))
+            t = threading.Thread(target=srv.serve_forever)
+            t.daemon = True
+            t.start()
+            url = 'http://127.0.0.1:%%d/%%s' %% (srv.server_address[1],
+                                               os.path.basename(sys.argv[1]))
+
+            for cycle in (False, True):
+                for _ in range(10):
+                    s = curled.util.stream_url(url, max_buffer=4096)
+                    s.read(100)
+                    if cycle:
+                        s.cycle = s
+                    del s
+                gc.collect()
+            u = curled.util.fetch_url(url)
+            assert u.length() == %d
+        ''' % len(self.body), self.path)
+        self.assertEqual(code, 0, err)
+        self.assertEqual(err, b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Here there be dragons
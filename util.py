@@ -6,27 +6,154 @@
 ##
 from __future__ import absolute_import
 
-import io
+import collections, contextlib, io, mmap, os, sys, threading, time, weakref
 from . import objects, constants
 
 
+class url_headers(object):
+    """An ordered, case-insensitive multi-valued map of the HTTP headers
+    of a response.  Names and values are byte strings; names may be
+    looked up as either byte or Unicode strings.  Names are indexed as
+    the headers arrive, so lookups do not scan the headers.
+
+    Iterating yields (name, value) tuples for the final response.  When
+    redirects are followed, the headers of every response in the chain
+    are kept, in order, in .blocks, a list of (status, headers) pairs,
+    where headers is a list of (name, value) tuples.
+
+    Attributes:
+    .status -- the status code of the final response, if known.
+    .blocks -- the status and headers of each response received.
+    """
+    __slots__ = ('status', 'blocks', '_items', '_index')
+
+    def __init__(self):
+        self.status = None
+        self._items = []
+        self._index = {}  # lowercase name -> list of values
+        self.blocks = [(None, self._items)]
+
+    @staticmethod
+    def _key(name):
+        """[private] Convert a header name into an index key.
+        """
+        if not isinstance(name, bytes):
+            name = name.encode('latin-1')
+        return name.lower()
+
+    def start(self, status):
+        """Begin a new block of headers, for a response with the given
+        status code.
+        """
+        if self._items or self.status is not None:
+            self._items = []
+            self._index = {}
+            self.blocks.append((status, self._items))
+        else:
+            self.blocks[-1] = (status, self._items)
+        self.status = status
+
+    def add(self, name, value):
+        """Add a header to the current block.
+        """
+        self._items.append((name, value))
+        self._index.setdefault(self._key(name), []).append(value)
+
+    def feed(self, line):
+        """Parse one raw line, as passed to a header callback.  Returns
+        True if the line ends a block of headers, otherwise False.
+        """
+        if line.startswith(b'HTTP/'):
+            code = line.split(None, 2)[1:2]
+            self.start(int(code[0]) if code and code[0].isdigit() else None)
+        elif b':' in line:
+            key, val = line.rstrip(b'\r\n').split(b':', 1)
+            self.add(key, val.lstrip())
+        elif not line.strip(b'\r\n'):
+            return True
+        return False
+
+    def get(self, name, default=None):
+        """Return the first value of the named header, or default.
+        """
+        vs = self._index.get(self._key(name))
+        return vs[0] if vs else default
+
+    def get_all(self, name):
+        """Return a list of all the values of the named header.
+        """
+        return list(self._index.get(self._key(name), ()))
+
+    def keys(self):
+        seen, out = set(), []
+        for name, _ in self._items:
+            key = self._key(name)
+            if key not in seen:
+                seen.add(key)
+                out.append(name)
+        return out
+
+    def __getitem__(self, name):
+        vs = self._index.get(self._key(name))
+        if not vs:
+            raise KeyError(name)
+        return vs[0]
+
+    def __contains__(self, name):
+        return self._key(name) in self._index
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return 'url_headers(%r)' % (self._items, )
+
+    @property
+    def content_length(self):
+        """The Content-Length as an integer, or None."""
+        v = self.get(b'content-length')
+        return int(v) if v is not None and v.strip().isdigit() else None
+
+    @property
+    def etag(self):
+        """The ETag, or None."""
+        return self.get(b'etag')
+
+    @property
+    def last_modified(self):
+        """The Last-Modified time in seconds since the Unix epoch, or
+        None if it is missing or malformed.
+        """
+        import email.utils  # deferred; slow to import
+        v = self.get(b'last-modified')
+        t = v and email.utils.parsedate_tz(v.decode('latin-1'))
+        return email.utils.mktime_tz(t) if t else None
+
+
 class url_result(object):
     """A file-like object representing the results of a cURL query.
 
     Attributes:
     .url        -- the original URL requested.
     .actual_url -- the actual URL loaded, after redirection.
-    .headers    -- a list of (name, value) tuples for HTTP headers.
+    .headers    -- a url_headers giving the HTTP headers.
     .code       -- the response code from the server.
     .duration   -- how long the request took, in seconds (float).
+    .error      -- the CURLError for a failed transfer, or None; set
+                   only by fetch_many(), which does not raise it.
     """
     def __init__(self, url):
         self.url = url
         self.actual_url = url
-        self.headers = []
+        self.headers = url_headers()
         self.code = None
         self.duration = None
+        self.error = None
         self.data = io.BytesIO()
+        self.sink = None  # CFileSink receiving the body, if any
 
     def __enter__(self):
         return self
@@ -56,83 +183,1030 @@ class url_result(object):
             self.data.seek(save)
 
     def keys(self):
-        return list(set(s for s, t in self.headers))
+        return self.headers.keys()
 
     def close(self):
         return self.data.close()
 
     def __getitem__(self, itm):
-        for s, t in self.headers:
-            if itm.lower() == s.lower():
-                return t
-        else:
-            raise KeyError(itm)
+        return self.headers[itm]
+
+
+class CurlPool(object):
+    """A thread-safe pool of reusable Curl objects.
+
+    Handles are lent out by .handle() and returned to the pool, reset
+    to their default options, when the borrower is done with them.
+    Because curl_easy_reset() preserves a handle's connection and DNS
+    caches, later requests to the same host can reuse the connections
+    opened by earlier ones.
+
+    At most maxsize idle handles are retained; handles returned to a
+    full pool are discarded.  Handles left idle for longer than
+    max_idle seconds are discarded too.  Lending never blocks: if no
+    idle handle is available, a new one is created.
 
+    In a child process after fork(), every pool starts out empty, since
+    the idle handles belong to the parent.
+    """
+    # All pools in existence, so they can be emptied after fork().
+    pools = weakref.WeakSet()
+
+    def __init__(self, maxsize=8, max_idle=60.0, factory=objects.Curl):
+        self.maxsize = maxsize
+        self.max_idle = max_idle
+        self.factory = factory
+        self._idle = collections.deque()  # (time returned, curl)
+        self._lock = threading.Lock()
+        CurlPool.pools.add(self)
+
+    def __len__(self):
+        return len(self._idle)
+
+    def _evict(self, now):
+        """[private] Discard handles idle since before now - max_idle.
+        The caller must hold the lock.
+        """
+        while self._idle and now - self._idle[0][0] > self.max_idle:
+            self._idle.popleft()
+
+    def acquire(self):
+        """Borrow a Curl object from the pool, creating one if none is
+        idle.  Return it with .release() when done.
+        """
+        with self._lock:
+            self._evict(time.time())
+            if self._idle:
+                return self._idle.pop()[1]
+
+        return self.factory()
+
+    def release(self, curl):
+        """Return a borrowed Curl object to the pool.
+        """
+        if curl._curl is None:
+            return  # already cleaned up, as when collected with a cycle
+        curl.reset()
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            if len(self._idle) < self.maxsize:
+                self._idle.append((now, curl))
+
+    @contextlib.contextmanager
+    def handle(self):
+        """Context manager that borrows a Curl object for the duration
+        of a with statement.
+
+          with pool.handle() as curl:
+              ...
+        """
+        curl = self.acquire()
+        try:
+            yield curl
+        finally:
+            self.release(curl)
+
+    def clear(self):
+        """Discard all idle handles.
+        """
+        with self._lock:
+            self._idle.clear()
+
+    @classmethod
+    def after_fork(cls):
+        """[private] Called in the child process after fork(): abandon the
+        idle handles of every pool, and replace the locks, in case other
+        threads held them during the fork.
+        """
+        for pool in list(cls.pools):
+            pool._lock = threading.Lock()
+            pool._idle.clear()
+
+
+# The pool used by fetch_url() and track_location() by default.
+default_pool = CurlPool()
 
-def fetch_url(url, headers={}, curl_obj=None):
+if hasattr(os, 'register_at_fork'):  # Python 3.7+
+    os.register_at_fork(after_in_child=CurlPool.after_fork)
+
+
+def fetch_url(url, headers={}, curl_obj=None, sink=None, metrics=None,
+              cache=None):
     """Download the specified URL and return a file-like object to
     represent it.  The headers, if specified, are included with the
     request to the server.
 
-    If no Curl object is specified, a new one will be created for each
-    request.  To specify custom settings, create your own and pass it
-    via the curl_obj parameter.  Note that some of the options of your
-    object will be modified when this occurs.
+    If no Curl object is specified, one is borrowed from default_pool
+    for the duration of the request.  To specify custom settings,
+    create your own and pass it via the curl_obj parameter.  Note that
+    some of the options of your object will be modified when this
+    occurs.
+
+    The body is normally collected by a Python callback.  If sink is
+    'memory', libcurl instead writes it to an in-memory C stream, and if
+    sink is 'file', to an anonymous temporary file, so that the body
+    never passes through Python during the transfer; see CFileSink.
+
+    If metrics is given, the transfer is recorded in it whether or not
+    it succeeds; see metrics.TransferMetrics.
+
+    If cache is given, such as a cache.DiskCache or cache.MemoryCache,
+    the response is taken from it when possible and stored in it when
+    allowed; only transfers that are actually made are recorded in
+    metrics.
 
     This function is similar in spirit to urllib.urlopen().
     """
+    if cache is not None:
+        return cache.fetch(url, headers, curl_obj, sink, metrics)
     if curl_obj is None:
-        c = objects.Curl()
-        c.setopt(constants.CURLOPT_FOLLOWLOCATION, True)
-        c.setopt(constants.CURLOPT_MAXREDIRS, 5)
-    else:
-        c = curl_obj
+        with default_pool.handle() as c:
+            return fetch_url(url, headers, default_options(c), sink,
+                             metrics)
+
+    c, u = prepare_fetch(url, headers, curl_obj, sink)
+    try:
+        c.perform()
+    except objects.CURLError as e:
+        if metrics is not None:
+            metrics.record(c, e.args[1])
+        raise
+    if metrics is not None:
+        metrics.record(c)
+    return finish_fetch(c, u)
 
+
+# A source of URLs for fetch_many() may yield url_not_ready when it has
+# no URL available yet, rather than blocking; fetch_many() then keeps its
+# transfers running and asks again within starved_poll_ms milliseconds.
+url_not_ready = object()
+starved_poll_ms = 50
+
+
+def fetch_many(urls, concurrency=16, headers={}, sink=None, metrics=None):
+    """Download each of the specified URLs, running up to concurrency
+    transfers at once, and yield a url_result for each as soon as it
+    finishes, so results arrive in order of completion rather than in
+    the order given.  The headers, sink and metrics are as for
+    fetch_url(), and apply to every request.
+
+    A failed transfer does not stop the others; instead its url_result
+    is yielded with its .error set to the CURLError describing the
+    failure.
+
+    The URLs are consumed lazily, and at most concurrency transfers are
+    in progress at a time, so urls may be an iterator of any length.
+    The Curl objects are borrowed from default_pool and reused from one
+    transfer to the next, so connections to the same host are reused.
+    """
+    hdrs = None
+    if headers:
+        hdrs = objects.StringList(
+            '%s: %s' % (k, v) for k, v in headers.items())
+
+    multi = objects.CurlMulti()
+    idle = []  # Curl objects available for the next transfer
+    active = {}  # native handle -> (curl, url_result)
+    pending = iter(urls)
+    try:
+        while True:
+            starved = False
+            while pending is not None and len(active) < concurrency:
+                try:
+                    url = next(pending)
+                except StopIteration:
+                    pending = None
+                    break
+                if url is url_not_ready:
+                    starved = True
+                    break
+
+                c = idle.pop() if idle else default_pool.acquire()
+                try:
+                    c, u = prepare_fetch(url, None, default_options(c), sink)
+                    if hdrs is not None:
+                        c.setopt(constants.CURLOPT_HTTPHEADER, hdrs)
+                    multi.add(c)
+                except:
+                    default_pool.release(c)
+                    raise
+                active[c._curl] = (c, u)
+
+            if not active and not starved:
+                break
+
+            running = multi.perform()
+            for c, res in multi.info_read():
+                c, u = active.pop(c._curl)
+                if metrics is not None:
+                    metrics.record(c, res)
+                finish_fetch(c, u)
+                if res != constants.CURLE_OK:
+                    u.error = transfer_error(c, res)
+                c.reset()
+                idle.append(c)
+                yield u
+
+            if starved:
+                multi.poll(starved_poll_ms)
+            elif running and (pending is None or len(active) >= concurrency):
+                multi.poll()
+    finally:
+        for c, u in active.values():
+            multi.remove(c)
+            idle.append(c)
+        multi.close()
+        for c in idle:
+            default_pool.release(c)
+
+
+class sharded_result(url_result):
+    """A url_result whose body is stored in a file, as yielded by
+    fetch_sharded().  The file is opened when the body is first read.
+
+    Attributes are as for url_result, plus:
+    .path -- the name of the file holding the body, which the caller
+             is responsible for removing; None if the transfer failed.
+    """
+    def __init__(self, url, path):
+        self.path = path
+        self._data = None
+        url_result.__init__(self, url)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = open(self.path, 'rb') if self.path else io.BytesIO()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        # url_result.__init__() installs an empty buffer; open lazily instead.
+        self._data = None if isinstance(value, io.BytesIO) else value
+
+
+def fetch_sharded(urls, processes=None, concurrency=16, headers={},
+                  directory=None):
+    """Download each of the specified URLs using several worker
+    processes, each running up to concurrency transfers at once as
+    fetch_many() does, so that the CPU spent on TLS and decompression
+    is spread across cores.  The number of processes defaults to the
+    number of CPUs.
+
+    Yields a sharded_result for each URL as it finishes, in order of
+    completion.  Bodies are not sent back to this process: each worker
+    writes them to files in directory (by default, a new temporary
+    directory), and the results refer to those files.  Failed transfers
+    are reported by .error, as for fetch_many().
+
+    As for fetch_many(), urls may be an iterator of any length; URLs are
+    handed to the workers through a bounded queue as they are ready.
+    """
+    import multiprocessing, multiprocessing.queues, tempfile  # deferred
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix='curled-')
+    elif not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    tasks = multiprocessing.Queue(processes * concurrency * 2)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=shard_worker,
+                                args=(tasks, results, concurrency, headers,
+                                      directory)) for _ in range(processes)
+    ]
+    for w in workers:
+        w.daemon = True
+        w.start()
+
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                tasks.put(item, timeout=0.5)
+                return True
+            except multiprocessing.queues.Full:
+                continue
+        return False
+
+    failed = []  # an exception raised by urls, if any
+
+    def feed():
+        try:
+            for url in urls:
+                if not put(url):
+                    return
+        except BaseException as e:
+            failed.append(e)
+        finally:
+            for w in workers:
+                put(None)
+
+    feeder = threading.Thread(target=feed)
+    feeder.daemon = True
+    feeder.start()
+
+    try:
+        running = len(workers)
+        while running:
+            try:
+                item = results.get(timeout=1.0)
+            except multiprocessing.queues.Empty:
+                if any(w.exitcode for w in workers):
+                    raise objects.CURLError("fetch_sharded worker failed")
+                continue
+
+            if item is None:
+                running -= 1
+                continue
+
+            url, actual_url, code, duration, blocks, error, path = item
+            u = sharded_result(url, path)
+            u.actual_url = actual_url
+            u.code = code
+            u.duration = duration
+            for status, items in blocks:
+                u.headers.start(status)
+                for name, value in items:
+                    u.headers.add(name, value)
+            if error is not None:
+                u.error = objects.CURLError(*error)
+            yield u
+
+        if failed:
+            raise failed[0]
+    finally:
+        stop.set()
+        for w in workers:
+            if w.is_alive():
+                w.terminate()
+            w.join()
+
+
+def shard_worker(tasks, results, concurrency, headers, directory):
+    """[private] Body of a fetch_sharded() worker process: fetch the URLs
+    taken from tasks, until None is taken, and report each result to
+    results, followed by None when done.
+    """
+    prefix = os.path.join(directory, '%d-' % os.getpid())
+    n = 0
+    for u in fetch_many(queued_urls(tasks), concurrency, headers):
+        path = error = None
+        if u.error is None:
+            path = prefix + str(n)
+            n += 1
+            with open(path, 'wb') as fp:
+                fp.write(u.data.getvalue())
+        else:
+            error = tuple(u.error.args)
+
+        results.put((u.url, u.actual_url, u.code, u.duration,
+                     u.headers.blocks, error, path))
+    results.put(None)
+
+
+def queued_urls(tasks):
+    """[private] Yield the URLs taken from the queue tasks, until None is
+    taken, without blocking: yields url_not_ready when the queue is
+    empty, as fetch_many() allows.
+    """
+    import multiprocessing.queues  # deferred
+
+    while True:
+        try:
+            url = tasks.get_nowait()
+        except multiprocessing.queues.Empty:
+            yield url_not_ready
+            continue
+        if url is None:
+            return
+        yield url
+
+
+def default_options(c):
+    """[private] Apply the options fetch_url() uses for Curl objects it
+    supplies itself, and return c.
+    """
+    c.setopt(constants.CURLOPT_FOLLOWLOCATION, True)
+    c.setopt(constants.CURLOPT_MAXREDIRS, 5)
+    return c
+
+
+def prepare_fetch(url, headers, c, sink=None):
+    """[private] Configure Curl object c to fetch the specified URL, as
+    for fetch_url().  Returns a pair (c, result) where result is the
+    url_result that will receive the response once c is performed.
+    """
     u = url_result(url)
     c.setopt(constants.CURLOPT_URL, url)
-    c.setopt(constants.CURLOPT_WRITEFUNCTION, u.data)
+    if sink is None:
+        c.setopt(constants.CURLOPT_WRITEFUNCTION,
+                 objects.WriteView(u.data.write))
+    elif sink == 'memory':
+        u.sink = objects.CFileSink.memstream()
+    elif sink == 'file':
+        import tempfile  # deferred; slow to import
+        u.data = tempfile.TemporaryFile()
+        u.sink = objects.CFileSink.fdopen(u.data.fileno())
+    else:
+        raise ValueError("unknown sink type", sink)
 
-    def recv_header(buf):
-        if b':' in buf:
-            key, val = buf.rstrip(b'\r\n').split(b':', 1)
-            u.headers.append((key, val.lstrip()))
+    if u.sink is not None:
+        c.setopt(constants.CURLOPT_WRITEFUNCTION, u.sink)
 
-    c.setopt(constants.CURLOPT_HEADERFUNCTION, recv_header)
+    c.setopt(constants.CURLOPT_HEADERFUNCTION, u.headers.feed)
     if headers:
         c.setopt(constants.CURLOPT_HTTPHEADER,
                  list('%s: %s' % (k, v) for k, v in headers.items()))
-    c.perform()
+    return c, u
 
+
+def finish_fetch(c, u):
+    """[private] Fill in a url_result from the state of the Curl object
+    that performed its transfer, and rewind it for reading.
+    """
     u.actual_url = c.getinfo(constants.CURLINFO_EFFECTIVE_URL)
     u.duration = c.getinfo(constants.CURLINFO_TOTAL_TIME)
     u.code = c.getinfo(constants.CURLINFO_RESPONSE_CODE)
 
+    if u.sink is not None:
+        # Detach the sink before closing its stream, since c may be used
+        # again after this.
+        c.setopt(constants.CURLOPT_WRITEFUNCTION, None)
+        data = u.sink.close()
+        if data is not None:
+            u.data = io.BytesIO(data)
+        u.sink = None
+
     u.seek(0)
     return u
 
 
+class url_stream(object):
+    """A file-like object giving access to the results of a cURL query
+    while the body is still being transferred.  Returned by stream_url().
+
+    Attributes are as for url_result; .actual_url and .duration are set
+    once the transfer is complete.
+
+    At most about max_buffer bytes of the body are buffered at a time;
+    if the reader falls behind, the transfer is paused until it catches
+    up.  Reading blocks until enough data have arrived.
+    """
+    def __init__(self, url, curl, max_buffer, pool=None):
+        self.url = url
+        self.actual_url = url
+        self.headers = url_headers()
+        self.code = None
+        self.duration = None
+        self.max_buffer = max_buffer
+
+        self._curl = curl
+        self._pool = pool  # where to return curl, if borrowed
+        self._multi = objects.CurlMulti()
+        self._buf = bytearray()
+        self._limit = max_buffer
+        self._ready = False  # True once the final headers are complete
+        self._paused = False
+        self._done = False
+        self._error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def recv_header(self, buf):
+        """[private] Header callback: collect headers, and note when the
+        final block of headers is complete.
+        """
+        if self.headers.feed(buf):
+            # Informational and redirect responses are followed by
+            # another block of headers.
+            st = self.headers.status
+            if st is None or not (100 <= st < 200 or 300 <= st < 400):
+                self._ready = True
+
+    def recv_data(self, data):
+        """[private] Write callback: buffer data, or pause the transfer
+        if the buffer is full.
+        """
+        if len(self._buf) >= self._limit:
+            self._paused = True
+            return constants.CURL_WRITEFUNC_PAUSE
+
+        self._buf += data
+        self._ready = True
+
+    def _pump(self, cond, want=0):
+        """[private] Run the transfer until cond() is true, or until the
+        transfer is complete, buffering at least want bytes if need be.
+        Raises CURLError if the transfer failed before cond() became true.
+        """
+        while not cond() and not self._done:
+            # The reader needs more than is buffered, so always make room
+            # for at least one more chunk.
+            self._limit = max(self.max_buffer, want, len(self._buf) + 1)
+            if self._paused:
+                self._paused = False
+                self._curl.pause(constants.CURLPAUSE_CONT)
+
+            running = self._multi.perform()
+            for c, res in self._multi.info_read():
+                self._finish(res)
+
+            if running and not cond():
+                self._multi.poll()
+
+        if self._error is not None and not cond():
+            raise self._error
+
+    def _finish(self, res):
+        """[private] Record the outcome of the completed transfer and give
+        up the Curl object.
+        """
+        c = self._curl
+        if res == constants.CURLE_OK:
+            self.actual_url = c.getinfo(constants.CURLINFO_EFFECTIVE_URL)
+            self.duration = c.getinfo(constants.CURLINFO_TOTAL_TIME)
+            self.code = c.getinfo(constants.CURLINFO_RESPONSE_CODE)
+        else:
+            self._error = transfer_error(c, res)
+
+        self._done = True
+        self._ready = True
+        self._release()
+
+    def _release(self):
+        """[private] Give up the Curl object and the multi handle.
+        """
+        c, self._curl = self._curl, None
+        if c is None:
+            return
+
+        self._multi.close()
+        if self._pool is not None:
+            self._pool.release(c)
+
+    def start(self):
+        """[private] Begin the transfer, and wait for the headers.
+        """
+        self._multi.add(self._curl)
+        self._pump(lambda: self._ready)
+        if self._error is not None:
+            raise self._error
+        elif self.code is None:
+            self.code = self._curl.getinfo(constants.CURLINFO_RESPONSE_CODE)
+
+    def read(self, n=-1):
+        """Read up to n bytes of the body, or the rest of it if n < 0.
+        Returns an empty string at the end of the body.
+        """
+        if n is None or n < 0:
+            self._pump(lambda: False, sys.maxsize)
+            n = len(self._buf)
+        else:
+            self._pump(lambda: len(self._buf) >= n, n)
+
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        return out
+
+    def readline(self):
+        """Read and return one line of the body, including the trailing
+        newline if present.  Returns an empty string at the end of the
+        body.
+        """
+        pos = [0]
+
+        def has_line():
+            if self._buf.find(b'\n', pos[0]) >= 0:
+                return True
+            pos[0] = len(self._buf)
+            return False
+
+        self._pump(has_line)
+        end = self._buf.find(b'\n') + 1 or len(self._buf)
+        out = bytes(self._buf[:end])
+        del self._buf[:end]
+        return out
+
+    def iter_content(self, chunk_size=None):
+        """Iterate over the body in chunks of chunk_size bytes (the last
+        may be shorter), or in whatever sizes the data arrive if
+        chunk_size is None.
+        """
+        while True:
+            if chunk_size is None:
+                self._pump(lambda: self._buf)
+                data = bytes(self._buf)
+                del self._buf[:]
+            else:
+                data = self.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+    def iter_lines(self):
+        """Iterate over the lines of the body, without line endings.
+        """
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line.rstrip(b'\r\n')
+
+    def keys(self):
+        return self.headers.keys()
+
+    def __getitem__(self, itm):
+        return self.headers[itm]
+
+    def close(self):
+        """Abandon the transfer, if it is still running.
+        """
+        if getattr(self, '_curl', None) is not None:
+            self._release()
+        self._done = True
+        self._buf = bytearray()
+
+
+def stream_callback(stream, name):
+    """[private] Return a function calling the named method of stream,
+    which refers to stream only weakly.  The Curl object keeps its
+    callbacks, so bound methods would make a cycle, and the stream would
+    not be closed as soon as it is abandoned.
+    """
+    ref = weakref.ref(stream)
+
+    def callback(data):
+        s = ref()
+        if s is not None:
+            return getattr(s, name)(data)
+
+    return callback
+
+
+def stream_url(url, headers={}, curl_obj=None, max_buffer=1 << 20):
+    """Begin downloading the specified URL and return a url_stream to
+    represent it, as soon as the response headers have arrived.  The
+    body can then be read incrementally while the transfer proceeds.
+    The arguments are as for fetch_url().
+
+    Unlike fetch_url(), a Curl object borrowed from default_pool is not
+    returned to the pool until the stream is exhausted or closed.
+    """
+    if curl_obj is None:
+        c, pool = default_options(default_pool.acquire()), default_pool
+    else:
+        c, pool = curl_obj, None
+
+    u = url_stream(url, c, max_buffer, pool)
+    try:
+        c.setopt(constants.CURLOPT_URL, url)
+        c.setopt(constants.CURLOPT_WRITEFUNCTION,
+                 stream_callback(u, 'recv_data'))
+        c.setopt(constants.CURLOPT_HEADERFUNCTION,
+                 stream_callback(u, 'recv_header'))
+        if headers:
+            c.setopt(constants.CURLOPT_HTTPHEADER,
+                     list('%s: %s' % (k, v) for k, v in headers.items()))
+        u.start()
+    except:
+        u.close()
+        raise
+
+    return u
+
+
 def track_location(url, headers={}):
     """Return a list of the URL's, beginning from the one given,
     that will be traversed when following the redirect chain from
     the starting URL.
     """
-    c = objects.Curl()
-    c.setopt(constants.CURLOPT_FOLLOWLOCATION, False)
-    c.setopt(constants.CURLOPT_NOBODY, True)
+    with default_pool.handle() as c:
+        c.setopt(constants.CURLOPT_FOLLOWLOCATION, False)
+        c.setopt(constants.CURLOPT_NOBODY, True)
 
-    cur = url
-    out = [url]
-    while True:
-        u = fetch_url(cur, headers, c)
-        v = c.getinfo(constants.CURLINFO_REDIRECT_URL)
-        if v is None or v in out:
-            break
-        out.append(v)
-        cur = v
+        cur = url
+        out = [url]
+        while True:
+            u = fetch_url(cur, headers, c)
+            v = c.getinfo(constants.CURLINFO_REDIRECT_URL)
+            if v is None or v in out:
+                break
+            out.append(v)
+            cur = v
 
     return out
 
 
-__all__ = ('fetch_url', 'track_location')
+class download_segment(object):
+    """[private] The state of one byte range of a segmented download.
+    The range is [start, end), of which the first done bytes have been
+    written to the target file.
+    """
+    __slots__ = ('start', 'end', 'done', 'tries', 'curl', 'sink')
+
+    def __init__(self, start, end, done=0):
+        self.start = start
+        self.end = end
+        self.done = done
+        self.tries = 0
+        self.curl = None  # Curl object while the segment is running
+        self.sink = None  # WriteBuffer while the segment is running
+
+    def __len__(self):
+        return self.end - self.start
+
+
+class RangeNotSupported(objects.CURLError):
+    """[private] Raised when a server ignores a range request.
+    """
+    pass
+
+
+def download(url, path, segments=4, headers={}, retries=3,
+             min_segment=1 << 20, checkpoint_interval=1.0):
+    """Download the specified URL to the file at path, and return the
+    number of bytes written.
+
+    The size of the body is found first with a HEAD request.  If the
+    server accepts byte ranges, the file is preallocated and up to
+    segments ranges of it (each at least min_segment bytes) are fetched
+    concurrently, each written directly into its own region of a memory
+    map of the file.  Otherwise the body is fetched in a single stream.
+
+    A failed transfer is retried up to retries times, continuing from
+    where it stopped if ranges are supported.  While a segmented
+    download is in progress, its state is kept in path + '.ckpt', so
+    that if it is interrupted, another call with the same URL and path
+    resumes it, provided the body has not changed.  The checkpoint file
+    is removed once the download is complete.
+
+    Raises CURLError if the download fails, including on HTTP errors.
+    """
+    hdrs = list('%s: %s' % (k, v) for k, v in headers.items())
+    try:
+        url, size, ranges, validator = probe_download(url, hdrs)
+    except objects.CURLError:
+        size, ranges, validator = None, False, None  # e.g., HEAD refused
+
+    if ranges and size is not None and size > 0:
+        try:
+            return download_segments(url, path, hdrs, size, validator,
+                                     segments, retries, min_segment,
+                                     checkpoint_interval)
+        except RangeNotSupported:
+            remove_if_present(path + '.ckpt')
+
+    return download_stream(url, path, hdrs, retries)
+
+
+def probe_download(url, hdrs):
+    """[private] Find out, with a HEAD request, where the URL leads and
+    how big its body is.  Returns a tuple (url, size, ranges, validator),
+    where size is None if unknown, ranges is true if the server accepts
+    byte ranges, and validator is the ETag or Last-Modified header value
+    identifying this version of the body, or None.
+    """
+    h = url_headers()
+    with default_pool.handle() as c:
+        default_options(c)
+        c.setopt(constants.CURLOPT_URL, url)
+        c.setopt(constants.CURLOPT_NOBODY, True)
+        c.setopt(constants.CURLOPT_FAILONERROR, True)
+        c.setopt(constants.CURLOPT_HEADERFUNCTION, h.feed)
+        if hdrs:
+            c.setopt(constants.CURLOPT_HTTPHEADER, hdrs)
+        c.perform()
+
+        url = c.getinfo(constants.CURLINFO_EFFECTIVE_URL)
+        size = c.getinfo(constants.CURLINFO_CONTENT_LENGTH_DOWNLOAD_T)
+
+    ranges = b'bytes' in (h.get(b'accept-ranges') or b'').lower()
+    validator = h.etag or h.get(b'last-modified')
+    if validator is not None:
+        validator = validator.decode('latin-1')
+    return url, (size if size >= 0 else None), ranges, validator
+
+
+def download_stream(url, path, hdrs, retries):
+    """[private] Download the URL to path in a single transfer, starting
+    over on failure.  Returns the number of bytes written.
+    """
+    with default_pool.handle() as c, open(path, 'wb') as fp:
+        default_options(c)
+        c.setopt(constants.CURLOPT_URL, url)
+        c.setopt(constants.CURLOPT_FAILONERROR, True)
+        c.setopt(constants.CURLOPT_WRITEFUNCTION, objects.WriteView(fp.write))
+        if hdrs:
+            c.setopt(constants.CURLOPT_HTTPHEADER, hdrs)
+
+        for attempt in range(retries + 1):
+            fp.seek(0)
+            fp.truncate()
+            try:
+                c.perform()
+                break
+            except objects.CURLError:
+                if attempt == retries:
+                    raise
+                time.sleep(retry_delay(attempt + 1))
+
+        return fp.tell()
+
+
+def download_segments(url, path, hdrs, size, validator, segments, retries,
+                      min_segment, checkpoint_interval):
+    """[private] Download the URL to path in concurrent byte ranges, as
+    described for download().  Raises RangeNotSupported if the server
+    turns out not to honour range requests.
+    """
+    ckpt = path + '.ckpt'
+    segs = load_checkpoint(ckpt, path, url, size, validator)
+    if segs is None:
+        n = max(1, min(segments, size // min_segment))
+        bounds = [size * i // n for i in range(n + 1)]
+        segs = [download_segment(bounds[i], bounds[i + 1]) for i in range(n)]
+        mode = 'w+b'
+    else:
+        mode = 'r+b'
+
+    with open(path, mode) as fp:
+        fp.truncate(size)
+        if mode == 'w+b' and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fp.fileno(), 0, size)
+            except OSError:
+                pass  # not supported here; the file is merely sparse
+
+        mm = mmap.mmap(fp.fileno(), size)
+        try:
+            run_segments(mm, url, hdrs, segs, retries,
+                         lambda: save_checkpoint(ckpt, mm, url, size,
+                                                 validator, segs),
+                         checkpoint_interval)
+        finally:
+            mm.close()
+
+    remove_if_present(ckpt)
+    return size
+
+
+def run_segments(mm, url, hdrs, segs, retries, checkpoint, interval):
+    """[private] Fetch each unfinished segment of segs into the memory
+    map mm concurrently, calling checkpoint() every interval seconds and
+    when stopping early.
+    """
+    multi = objects.CurlMulti()
+    running = {}  # native handle -> segment
+    waiting = []  # (due time, segment) awaiting a retry
+
+    def start(seg):
+        c = seg.curl = seg.curl or default_options(default_pool.acquire())
+        seg.sink = objects.WriteBuffer(memoryview(mm)[seg.start:seg.end],
+                                       seg.done)
+        c.setopt(constants.CURLOPT_URL, url)
+        c.setopt(constants.CURLOPT_FAILONERROR, True)
+        c.setopt(constants.CURLOPT_RANGE,
+                 '%d-%d' % (seg.start + seg.done, seg.end - 1))
+        c.setopt(constants.CURLOPT_WRITEFUNCTION, seg.sink)
+        if hdrs:
+            c.setopt(constants.CURLOPT_HTTPHEADER, hdrs)
+        multi.add(c)
+        running[c._curl] = seg
+
+    def stop(seg):
+        seg.done = seg.sink.offset
+        seg.sink.release()
+        seg.sink = None
+
+    complete = False
+    try:
+        for seg in segs:
+            if seg.done < len(seg):
+                start(seg)
+
+        last = time.time()
+        while running or waiting:
+            multi.perform()
+            for c, res in multi.info_read():
+                seg = running.pop(c._curl)
+                code = c.getinfo(constants.CURLINFO_RESPONSE_CODE)
+                stop(seg)
+                if code == 200:
+                    raise RangeNotSupported("server ignored range request",
+                                            url)
+                elif res == constants.CURLE_OK and seg.done == len(seg):
+                    default_pool.release(seg.curl)
+                    seg.curl = None
+                    continue
+
+                seg.tries += 1
+                if seg.tries > retries:
+                    if res == constants.CURLE_OK:
+                        res = constants.CURLE_PARTIAL_FILE
+                    raise transfer_error(c, res)
+                waiting.append((time.time() + retry_delay(seg.tries), seg))
+
+            now = time.time()
+            for item in [w for w in waiting if w[0] <= now]:
+                waiting.remove(item)
+                start(item[1])
+
+            if now - last >= interval:
+                checkpoint()
+                last = now
+
+            if running:
+                wait = min([1.0] + [due - now for due, seg in waiting])
+                multi.poll(max(0, int(wait * 1000)))
+            elif waiting:
+                time.sleep(max(0, min(due for due, seg in waiting) - now))
+
+        complete = True
+    finally:
+        for seg in running.values():
+            multi.remove(seg.curl)
+            stop(seg)
+        multi.close()
+        for seg in segs:
+            if seg.curl is not None:
+                default_pool.release(seg.curl)
+                seg.curl = None
+        if not complete:
+            checkpoint()
+
+
+def retry_delay(tries):
+    """[private] Return how long to wait, in seconds, before retry number
+    tries of a failed transfer.
+    """
+    return min(0.25 * 2**(tries - 1), 10.0)
+
+
+def load_checkpoint(ckpt, path, url, size, validator):
+    """[private] Return the segments recorded in the checkpoint file
+    ckpt, or None if there is none or it does not describe a download of
+    this version of the URL into the file at path.
+    """
+    import json  # deferred; slow to import
+    try:
+        with open(ckpt) as fp:
+            state = json.load(fp)
+        if (state['url'] != url or state['size'] != size
+                or state['validator'] != validator or validator is None
+                or os.path.getsize(path) != size):
+            return None
+        return [download_segment(*s) for s in state['segments']]
+    except (EnvironmentError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_checkpoint(ckpt, mm, url, size, validator, segs):
+    """[private] Record the progress of a segmented download in the
+    checkpoint file ckpt, once the data written so far are on disk.
+    """
+    import json  # deferred; slow to import
+    mm.flush()
+    state = dict(url=url, size=size, validator=validator, segments=[
+        (s.start, s.end, s.sink.offset if s.sink else s.done) for s in segs
+    ])
+    tmp = ckpt + '.tmp'
+    with open(tmp, 'w') as fp:
+        json.dump(state, fp)
+    os.rename(tmp, ckpt)
+
+
+def remove_if_present(path):
+    """[private] Remove the file at path, if it exists.
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def transfer_error(curl, res):
+    """[private] Construct the CURLError reporting that the transfer on
+    curl failed with CURLcode res.
+    """
+    desc = curl._p_curl_easy_strerror(res)
+    return objects.CURLError(
+        'curl_easy_perform: %s (%s)' % (curl.DEC(desc), res), res)
+
+
+__all__ = ('CurlPool', 'default_pool', 'fetch_url', 'fetch_many',
+           'fetch_sharded', 'stream_url', 'track_location', 'download')
 
 # Here there be dragons